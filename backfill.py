@@ -0,0 +1,41 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Tuple
+
+from config import BACKFILL_BATCH_SIZE, PURGE_PAUSE_SECONDS
+from crud import backfill_password_digests, backfill_password_scores, encrypt_plaintext_passwords
+
+logger = logging.getLogger(__name__)
+
+# (название, функция обработки одной пачки -> количество строк)
+BACKFILLS: List[Tuple[str, Callable[[int], Awaitable[int]]]] = [
+    ("digest", backfill_password_digests),
+    ("score", backfill_password_scores),
+    # последним: digest и score считаются по открытому тексту
+    ("encryption", encrypt_plaintext_passwords),
+]
+
+
+async def run_backfills() -> None:
+    """Фоновое заполнение новых колонок у существующих строк.
+
+    Каждая задача выполняется пачками по BACKFILL_BATCH_SIZE строк, каждая
+    пачка — своя транзакция, поэтому после перезапуска работа продолжается
+    с оставшихся строк. Между пачками та же пауза, что и у очистки.
+    """
+    for name, backfill in BACKFILLS:
+        total = 0
+        while True:
+            try:
+                done = await backfill(BACKFILL_BATCH_SIZE)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка заполнения {name}: {e}")
+                return
+            total += done
+            if done < BACKFILL_BATCH_SIZE:
+                break
+            await asyncio.sleep(PURGE_PAUSE_SECONDS)
+        if total:
+            logger.info(f"🧮 Заполнение {name} завершено: {total} строк")
@@ -0,0 +1,142 @@
+"""Задержка от нажатия кнопки до ответа бота и накладные расходы message_cleaner.
+
+Обработчик под message_cleaner отвечает новым сообщением, а нажатое
+сообщение удаляется в фоне. Для сравнения тот же обработчик замеряется
+под прежней версией декоратора (baseline_cleaner), которая дожидалась
+удаления до вызова обработчика. Bot API — локальный фейковый сервер с
+задержкой RTT, замер идёт до прихода sendMessage на сервер.
+Запуск: python bench/callback_latency.py [--no-scheduler]
+"""
+import asyncio
+import inspect
+import logging
+import sys
+import time
+
+import common
+from aiogram import Dispatcher, F, Router
+from aiogram.fsm.context import FSMContext
+from aiogram.types import CallbackQuery, Message, Update
+
+from decorators import MessageManager, message_cleaner
+from outbound import OutboundScheduler
+
+RTT = 0.05
+UPDATES = 40
+WRAPPER_CALLS = 20000
+
+logger = logging.getLogger(__name__)
+
+
+def baseline_cleaner(func):
+    """message_cleaner до оптимизации: сигнатура на каждый вызов, удаление до обработчика"""
+    async def wrapper(*args, **kwargs):
+        filtered_kwargs = {
+            k: v for k, v in kwargs.items()
+            if k in inspect.signature(func).parameters
+        }
+
+        state = None
+        for arg in args:
+            if isinstance(arg, FSMContext):
+                state = arg
+                break
+        state = filtered_kwargs.get('state', state)
+
+        data = await state.get_data() if state else {}
+        manager: MessageManager = data.get('manager', MessageManager())
+
+        message = None
+        callback = None
+        for arg in args:
+            if isinstance(arg, CallbackQuery):
+                message = arg.message
+                callback = arg
+                break
+            elif isinstance(arg, Message):
+                message = arg
+                break
+
+        if message and callback and not callback.data.startswith(("copy_", "length_", "check_password_", "main_menu", "check_custom", "check_hibp")):
+            try:
+                await message.delete()
+                manager.last_user_message = message.message_id
+            except Exception as e:
+                logger.error(f"Ошибка удаления: {e}")
+
+        result = await func(*args, **filtered_kwargs)
+
+        if isinstance(result, Message):
+            manager.track(result)
+            if state:
+                await state.update_data(manager=manager)
+
+        return result
+
+    return wrapper
+
+
+def build_dispatcher(cleaner) -> Dispatcher:
+    router = Router()
+
+    @router.callback_query(F.data.startswith("pswd_"))
+    @cleaner
+    async def reply(callback, state):
+        return await callback.message.answer(callback.data)
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    return dp
+
+
+async def measure(api, cleaner, use_scheduler: bool, label: str) -> None:
+    bot = api.bot()
+    if use_scheduler:
+        bot.session.middleware(OutboundScheduler())
+    dp = build_dispatcher(cleaner)
+
+    latencies = []
+    since_start = len(api.calls)
+    for i in range(UPDATES):
+        update = Update.model_validate(
+            common.callback_update(i, 1000 + i, f"pswd_{i}"), context={"bot": bot}
+        )
+        since = len(api.calls)
+        started = time.perf_counter()
+        await dp.feed_update(bot, update)
+        arrived, _ = api.first_call("sendMessage", since)
+        latencies.append(arrived - started)
+    await asyncio.sleep(RTT * 4)
+    deletes = sum(1 for method in api.methods(since_start) if method.startswith("deleteMessage"))
+
+    async def plain(callback, state):
+        return None
+
+    wrapped = cleaner(plain)
+    started = time.perf_counter()
+    for _ in range(WRAPPER_CALLS):
+        await wrapped(
+            object(), bot=bot, event_from_user=None, raw_state=None, handler=None,
+            event_update=None, event_router=None, fsm_storage=None, state=None
+        )
+    overhead = (time.perf_counter() - started) / WRAPPER_CALLS
+    print(
+        f"{label}: нажатие → ответ {common.quantiles(latencies)}; удалений {deletes}; "
+        f"накладные расходы {overhead * 1e6:.1f} us/вызов"
+    )
+    await bot.session.close()
+
+
+async def main(use_scheduler: bool) -> None:
+    logging.getLogger("aiogram.event").setLevel(logging.WARNING)
+    api = await common.FakeBotAPI(rtt=RTT).start()
+    print(
+        f"RTT {RTT * 1000:.0f} ms, {'с планировщиком' if use_scheduler else 'без планировщика'}"
+    )
+    await measure(api, baseline_cleaner, use_scheduler, "удаление до ответа")
+    await measure(api, message_cleaner, use_scheduler, "удаление в фоне   ")
+    await api.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main("--no-scheduler" not in sys.argv[1:]))
@@ -0,0 +1,174 @@
+"""Общие заготовки для замеров: путь к коду бота, тестовая БД и фейковый Bot API.
+
+Скрипты bench/ запускаются из корня репозитория (python bench/<имя>.py)
+и никогда не работают с боевой базой: БД берётся из BENCH_DATABASE_URL
+или поднимается локально через pgserver (pip install pgserver) в
+каталоге BENCH_PGDATA. Все таблицы этой БД пересоздаются перед замером.
+"""
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+# config.py требует токен; Telegram в замерах не участвует
+os.environ.setdefault("BOT_TOKEN", "123:abc")
+
+BENCH_TOKEN = os.environ["BOT_TOKEN"]
+BENCH_PGDATA = os.getenv("BENCH_PGDATA", "/tmp/zpassword-bench-pgdata")
+
+_pg_server = None
+
+
+def database_url() -> str:
+    """DSN тестовой БД: BENCH_DATABASE_URL или локальный pgserver"""
+    global _pg_server
+    url = os.getenv("BENCH_DATABASE_URL")
+    if url:
+        return url
+    if _pg_server is None:
+        try:
+            import pgserver
+        except ImportError as e:
+            raise RuntimeError(
+                "Для замеров с БД задайте BENCH_DATABASE_URL или установите pgserver"
+            ) from e
+        _pg_server = pgserver.get_server(BENCH_PGDATA, cleanup_mode=None)
+    return _pg_server.get_uri()
+
+
+async def setup_database(partitions: int = 0) -> None:
+    """Пустая схема с применёнными миграциями (и секционированием при partitions > 0)"""
+    import asyncpg
+    import database
+
+    url = database_url()
+    conn = await asyncpg.connect(url)
+    try:
+        await conn.execute("DROP SCHEMA public CASCADE; CREATE SCHEMA public;")
+    finally:
+        await conn.close()
+    database.DATABASE_URL = url
+    await database.init_db()
+    if partitions:
+        await database.partition_tables(partitions)
+
+
+def quantiles(samples: Sequence[float], scale: float = 1000.0, unit: str = "ms") -> str:
+    """«p50 … p95 … p99 …» для замеров в секундах"""
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(int(len(ordered) * q), len(ordered) - 1)] * scale
+    return (
+        f"p50 {statistics.median(ordered) * scale:.2f} {unit}, "
+        f"p95 {pick(0.95):.2f} {unit}, p99 {pick(0.99):.2f} {unit}"
+    )
+
+
+def callback_update(update_id: int, user_id: int, data: str, message_id: int = 9) -> Dict[str, Any]:
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "chat_instance": "bench",
+            "from": {"id": user_id, "is_bot": False, "first_name": "bench"},
+            "data": data,
+            "message": {
+                "message_id": message_id, "date": 1700000000, "text": "bench",
+                "chat": {"id": user_id, "type": "private"},
+            },
+        },
+    }
+
+
+def message_update(update_id: int, user_id: int, text: str) -> Dict[str, Any]:
+    message = {
+        "message_id": update_id, "date": 1700000000, "text": text,
+        "chat": {"id": user_id, "type": "private"},
+        "from": {"id": user_id, "is_bot": False, "first_name": "bench"},
+    }
+    if text.startswith("/"):
+        command = text.split()[0]
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(command)}]
+    return {"update_id": update_id, "message": message}
+
+
+def inline_update(update_id: int, user_id: int, query: str) -> Dict[str, Any]:
+    return {
+        "update_id": update_id,
+        "inline_query": {
+            "id": str(update_id),
+            "from": {"id": user_id, "is_bot": False, "first_name": "bench"},
+            "query": query,
+            "offset": "",
+        },
+    }
+
+
+class FakeBotAPI:
+    """Локальный сервер Bot API: отвечает успехом на любой метод и записывает вызовы.
+
+    calls — список (время прихода, метод, параметры). rtt добавляет задержку
+    к каждому ответу, чтобы имитировать сеть до api.telegram.org.
+    """
+
+    def __init__(self, rtt: float = 0.0):
+        self.rtt = rtt
+        self.calls: List[Tuple[float, str, Dict[str, str]]] = []
+        self._server = None
+
+    async def _handle(self, request):
+        from aiohttp import web
+
+        method = request.match_info["method"]
+        data = dict(await request.post())
+        self.calls.append((time.perf_counter(), method, data))
+        if self.rtt:
+            await asyncio.sleep(self.rtt)
+        if method in ("sendMessage", "editMessageText"):
+            chat_id = int(data.get("chat_id") or 0)
+            return web.json_response({"ok": True, "result": {
+                "message_id": int(data.get("message_id") or 100 + len(self.calls)),
+                "date": 1700000000,
+                "chat": {"id": chat_id, "type": "private"},
+                "text": data.get("text", ""),
+            }})
+        return web.json_response({"ok": True, "result": True})
+
+    async def start(self) -> "FakeBotAPI":
+        from aiohttp import web
+        from aiohttp.test_utils import TestServer
+
+        # bot.py включает логи INFO: строка на каждый запрос заслонила бы результаты
+        logging.getLogger("aiohttp.access").setLevel(logging.WARNING)
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        self._server = TestServer(app)
+        await self._server.start_server()
+        return self
+
+    def bot(self):
+        """Bot, чьи запросы уходят на этот сервер"""
+        from aiogram import Bot
+        from aiogram.client.session.aiohttp import AiohttpSession
+        from aiogram.client.telegram import TelegramAPIServer
+
+        base = str(self._server.make_url("")).rstrip("/")
+        return Bot(BENCH_TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(base)))
+
+    def methods(self, since: int = 0) -> List[str]:
+        return [method for _, method, _ in self.calls[since:]]
+
+    def first_call(self, method: str, since: int = 0) -> Optional[Tuple[float, Dict[str, str]]]:
+        for arrived, name, data in self.calls[since:]:
+            if name == method:
+                return arrived, data
+        return None
+
+    async def close(self) -> None:
+        if self._server is not None:
+            await self._server.close()
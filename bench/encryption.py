@@ -0,0 +1,61 @@
+"""Цена шифрования паролей: сохранение, страница списка и экспорт с ключом и без.
+
+PASSWORD_MASTER_KEY читается при импорте config, поэтому каждый вариант
+выполняется в отдельном процессе. Запуск: python bench/encryption.py
+"""
+import asyncio
+import base64
+import os
+import subprocess
+import sys
+import time
+
+PASSWORDS = 1000
+PAGES = 300
+
+
+async def measure(label: str) -> None:
+    import common
+    import database
+    from crud import get_passwords, iter_user_vault, register_user, save_password
+
+    await common.setup_database()
+    await register_user(1, "bench")
+    saves = []
+    for i in range(PASSWORDS):
+        started = time.perf_counter()
+        await save_password(1, f"Pw{i:05d}!x")
+        saves.append(time.perf_counter() - started)
+
+    pages = []
+    for i in range(PAGES):
+        started = time.perf_counter()
+        await get_passwords(1, 1 + i % (PASSWORDS // 15), 15)
+        pages.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    exported = [row async for row in iter_user_vault(1)]
+    export_time = time.perf_counter() - started
+
+    print(label)
+    print(f"  сохранение: {common.quantiles(saves)}")
+    print(f"  страница:   {common.quantiles(pages)}")
+    print(f"  экспорт {len(exported)} строк: {export_time * 1000:.1f} ms")
+    await database.close_pools()
+
+
+def main() -> None:
+    variants = (
+        ("без шифрования", ""),
+        ("AES-GCM", base64.b64encode(os.urandom(32)).decode()),
+    )
+    for label, key in variants:
+        env = dict(os.environ, PASSWORD_MASTER_KEY=key)
+        subprocess.run([sys.executable, __file__, label], env=env, check=True)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        asyncio.run(measure(sys.argv[1]))
+    else:
+        main()
@@ -0,0 +1,72 @@
+"""Память FSM на пользователя: MemoryStorage aiogram против хранилища бота.
+
+Хранилище бота берётся из create_dispatcher(), то есть ровно то, с которым
+работают обработчики (FSM_STORAGE, FSM_MAX_KEYS, FSM_TTL из окружения).
+У каждого пользователя — состояние и MessageManager с тремя сообщениями.
+Запуск: python bench/fsm_memory.py [пользователей]   (по умолчанию 1000000)
+"""
+import asyncio
+import gc
+import sys
+import time
+import tracemalloc
+
+import common  # noqa: F401  (путь к коду бота)
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from bot import create_dispatcher
+from decorators import MessageManager
+
+
+class ListMessageManager:
+    """MessageManager до перехода на __slots__ и array"""
+
+    def __init__(self):
+        self.message_stack = []
+        self.last_user_message = None
+
+
+async def fill(storage, manager_cls, users: int) -> None:
+    for user_id in range(10 ** 9, 10 ** 9 + users):
+        key = StorageKey(bot_id=1, chat_id=user_id, user_id=user_id)
+        manager = manager_cls()
+        for message_id in range(3):
+            manager.message_stack.append(user_id + message_id)
+        await storage.set_state(key, "PasswordStates:waiting")
+        await storage.set_data(key, {"manager": manager})
+
+
+def stored_keys(storage, users: int) -> int:
+    """Сколько записей осталось после вытеснения по FSM_MAX_KEYS"""
+    records = getattr(storage, "_records", None)
+    return len(records) if records is not None else users
+
+
+async def measure(label: str, storage, manager_cls, users: int) -> None:
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    await fill(storage, manager_cls, users)
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    keys = stored_keys(storage, users)
+    print(
+        f"{label}: {current / 2 ** 20:.0f} MiB на {users} пользователей, "
+        f"хранится ключей {keys} ({current / max(keys, 1):.0f} Б/ключ), "
+        f"заполнение {elapsed:.1f} с"
+    )
+
+
+async def main(users: int) -> None:
+    await measure("MemoryStorage + список", MemoryStorage(), ListMessageManager, users)
+
+    storage = create_dispatcher().storage
+    await measure(f"{type(storage).__name__} + MessageManager", storage, MessageManager, users)
+    await storage.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000))
@@ -0,0 +1,64 @@
+"""Скорость импорта документа через COPY и обратный экспорт.
+
+Запуск: python bench/import_vault.py [строк ...]   (по умолчанию 1000 и 100000)
+"""
+import asyncio
+import gzip
+import io
+import sys
+import time
+
+import common
+import database
+from crud import ensure_user, get_archive_block_count, get_password_count
+from export import export_vault
+from importer import import_document
+
+USER_ID = 1
+
+
+def build_csv(rows: int) -> bytes:
+    """CSV в формате /export: каждый десятый пароль с заметкой и одна битая строка"""
+    buf = io.StringIO()
+    buf.write("kind,id,password_id,value,created_at\n")
+    for i in range(rows):
+        buf.write(f"password,{i},,Pw{i:08d}!,2024-01-01T00:{i // 60 % 60:02d}:{i % 60:02d}\n")
+        if i % 10 == 0:
+            buf.write(f"note,{i},{i},заметка {i},2024-01-02T00:00:00\n")
+    buf.write("password,x,,short,\n")
+    return gzip.compress(buf.getvalue().encode())
+
+
+async def main(sizes) -> None:
+    await common.setup_database()
+    await ensure_user(USER_ID, "bench")
+    try:
+        for rows in sizes:
+            document = build_csv(rows)
+            started = time.perf_counter()
+            stats = await import_document(USER_ID, "bench", io.BytesIO(document), "vault.csv.gz")
+            elapsed = time.perf_counter() - started
+            total = stats.passwords + stats.notes
+            print(
+                f"{rows} паролей: импорт {elapsed:.2f} с ({total / elapsed:.0f} строк/с), "
+                f"паролей {stats.passwords}, заметок {stats.notes}, отклонено {stats.rejected}; "
+                f"в списке {await get_password_count(USER_ID)}, "
+                f"архивных блоков {await get_archive_block_count(USER_ID)}"
+            )
+
+        started = time.perf_counter()
+        document = await export_vault(USER_ID, "json")
+        exported = time.perf_counter() - started
+        document.file.seek(0)
+        stats = await import_document(USER_ID, "bench", io.BytesIO(document.file.read()), "vault.json")
+        document.close()
+        print(
+            f"экспорт JSON {exported:.2f} с; повторный импорт: "
+            f"паролей {stats.passwords}, заметок {stats.notes}, отклонено {stats.rejected}"
+        )
+    finally:
+        await database.close_pools()
+
+
+if __name__ == "__main__":
+    asyncio.run(main([int(arg) for arg in sys.argv[1:]] or [1000, 100000]))
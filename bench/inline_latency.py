@@ -0,0 +1,75 @@
+"""Задержка inline-ответа: от feed_update до прихода answerInlineQuery в Bot API.
+
+Сравниваются генерация на месте (запас пуст) и выдача из PasswordPool.
+Запуск: python bench/inline_latency.py [запросов]   (по умолчанию 300)
+"""
+import asyncio
+import json
+import logging
+import statistics
+import sys
+import time
+
+import common
+from aiogram.types import Update
+
+import inline
+from bot import create_dispatcher
+
+QUERIES = ["16", "12", "alnum 20", "pin", "32", "24"]
+TAKE_SAMPLES = 50
+
+
+async def run(dp, bot, api, count: int, label: str) -> None:
+    latencies = []
+    for i in range(count):
+        update = Update.model_validate(
+            common.inline_update(i, 1000 + i, QUERIES[i % len(QUERIES)]), context={"bot": bot}
+        )
+        since = len(api.calls)
+        started = time.perf_counter()
+        await dp.feed_update(bot, update)
+        arrived, _ = api.first_call("answerInlineQuery", since)
+        latencies.append(arrived - started)
+        # Пауза между запросами, как у живого пользователя: запас успевает пополниться
+        await asyncio.sleep(0.002)
+
+    takes = []
+    for _ in range(TAKE_SAMPLES):
+        await asyncio.sleep(0.02)
+        started = time.perf_counter()
+        inline.pool.take(16, "strong", inline.INLINE_RESULTS)
+        takes.append(time.perf_counter() - started)
+    print(
+        f"{label}: ответ {common.quantiles(latencies)}; "
+        f"pool.take({inline.INLINE_RESULTS}) {statistics.median(takes) * 1e6:.1f} us"
+    )
+
+
+async def main(count: int) -> None:
+    logging.getLogger("aiogram.event").setLevel(logging.WARNING)
+    api = await common.FakeBotAPI().start()
+    bot = api.bot()
+    dp = create_dispatcher()
+
+    pool_size = inline.pool.size
+    inline.pool.size = 0
+    await run(dp, bot, api, count, "без запаса")
+    inline.pool.size = pool_size
+    inline.pool.warm()
+    await asyncio.sleep(0.2)
+    await run(dp, bot, api, count, "с запасом ")
+
+    _, answer = api.first_call("answerInlineQuery", len(api.calls) - 1)
+    print(
+        f"cache_time {answer['cache_time']}, is_personal {answer['is_personal']}, "
+        f"вариантов {len(json.loads(answer['results']))}"
+    )
+
+    await dp.storage.close()
+    await bot.session.close()
+    await api.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 300))
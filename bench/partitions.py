@@ -0,0 +1,55 @@
+"""Задержка сохранения и чтения страницы паролей с hash-партиционированием и без.
+
+Запуск: python bench/partitions.py [строк] [партиций ...]
+По умолчанию 1 000 000 строк, сравниваются 0 (без партиций) и 16 партиций.
+"""
+import asyncio
+import random
+import sys
+import time
+
+import common
+import database
+from crud import get_passwords, save_password
+
+ROWS_PER_USER = 500
+OPERATIONS = 2000
+
+
+async def run(rows: int, partitions: int) -> None:
+    await common.setup_database(partitions)
+    users = max(rows // ROWS_PER_USER, 1)
+    async with database.get_connection() as conn:
+        await conn.execute(
+            "INSERT INTO users SELECT g, 'bench' FROM generate_series(1, $1) g", users
+        )
+        await conn.execute(
+            """INSERT INTO passwords (user_id, password, length)
+            SELECT g % $2 + 1, 'Passw0rd!xyz', 12 FROM generate_series(1, $1) g""",
+            rows, users
+        )
+        await conn.execute("ANALYZE")
+
+    inserts, pages = [], []
+    for _ in range(OPERATIONS):
+        user_id = random.randint(1, users)
+        started = time.perf_counter()
+        await save_password(user_id, "Passw0rd!abc")
+        inserts.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        await get_passwords(user_id)
+        pages.append(time.perf_counter() - started)
+    print(f"строк {rows}, партиций {partitions}")
+    print(f"  сохранение: {common.quantiles(inserts)}")
+    print(f"  страница:   {common.quantiles(pages)}")
+    await database.close_pools()
+
+
+async def main(rows: int, variants) -> None:
+    for partitions in variants:
+        await run(rows, partitions)
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    asyncio.run(main(args[0] if args else 1_000_000, args[1:] or [0, 16]))
@@ -0,0 +1,107 @@
+"""Сколько фильтров aiogram проверяет на одно обновление в графе роутеров бота.
+
+Обработчики не выполняются: их вызов подменяется, считаются только
+проверки фильтров. Необязательный аргумент — путь к другой версии
+дерева (например, git worktree базового коммита) для сравнения.
+Запуск: python bench/routing.py [путь]
+"""
+import asyncio
+import logging
+import sys
+import time
+
+import common
+from aiogram.dispatcher.event.handler import FilterObject, HandlerObject
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.types import Update
+
+if len(sys.argv) > 1:
+    sys.path.insert(0, sys.argv[1])
+
+from bot import create_dispatcher  # noqa: E402
+
+USER_ID = 5
+ROUNDS = 200
+
+CALLBACKS = [
+    "generate", "length_12", "pswd_list", "pswd_page_2_new", "pswd_archive", "archive_page_2",
+    "main_menu", "regenerate_12", "delete_1", "notes_list", "note_add_1", "notes_page_2",
+    "notes_search", "notes_reset", "note_del_1", "check_custom", "check_hibp", "clear_all",
+    "~AbCdEfGhIj",
+]
+MESSAGES = [
+    ("/start", None),
+    ("/help", None),
+    ("hello", None),
+    ("secret123", "PasswordCheckStates:AWAITING_HIBP_PASSWORD"),
+    ("secret123", "PasswordCheckStates:AWAITING_CUSTOM_PASSWORD"),
+    ("note", "NoteStates:AWAITING_NOTE_CONTENT"),
+]
+
+filter_calls = 0
+_filter_call = FilterObject.call
+_handler_call = HandlerObject.call
+
+
+async def _counted_filter(self, *args, **kwargs):
+    global filter_calls
+    filter_calls += 1
+    return await _filter_call(self, *args, **kwargs)
+
+
+async def _skipped_handler(self, *args, **kwargs):
+    # Обработчик обновлений самого Dispatcher нужен для маршрутизации
+    if getattr(self.callback, "__name__", "") == "_listen_update":
+        return await _handler_call(self, *args, **kwargs)
+    return True
+
+
+async def main() -> None:
+    global filter_calls
+    # Строка лога на каждое обновление исказила бы время feed_update
+    logging.getLogger("aiogram.event").setLevel(logging.WARNING)
+    FilterObject.call = _counted_filter
+    HandlerObject.call = _skipped_handler
+
+    api = await common.FakeBotAPI().start()
+    bot = api.bot()
+    dp = create_dispatcher()
+    key = StorageKey(bot_id=bot.id, chat_id=USER_ID, user_id=USER_ID)
+
+    rows = []
+    for data in CALLBACKS:
+        filter_calls = 0
+        update = Update.model_validate(common.callback_update(1, USER_ID, data), context={"bot": bot})
+        await dp.feed_update(bot, update)
+        rows.append((f"callback {data}", filter_calls))
+    for text, state in MESSAGES:
+        await dp.storage.set_state(key, state)
+        filter_calls = 0
+        update = Update.model_validate(common.message_update(1, USER_ID, text), context={"bot": bot})
+        await dp.feed_update(bot, update)
+        rows.append((f"message {text!r} [{state or '-'}]", filter_calls))
+    await dp.storage.set_state(key, None)
+
+    for name, calls in rows:
+        print(f"{calls:3d}  {name}")
+    total = sum(calls for _, calls in rows)
+    print(f"всего {total}, в среднем {total / len(rows):.1f} на обновление")
+
+    updates = [
+        Update.model_validate(common.callback_update(1, USER_ID, data), context={"bot": bot})
+        for data in CALLBACKS
+    ]
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        for update in updates:
+            await dp.feed_update(bot, update)
+    per_update = (time.perf_counter() - started) / (ROUNDS * len(updates))
+    print(f"feed_update (callback): {per_update * 1e6:.1f} us")
+
+    await dp.storage.close()
+    await bot.session.close()
+    await api.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,45 @@
+"""Стоимость построения строк на пути чтения: pydantic-модели против PasswordRow/NoteRow.
+
+Замеряется только создание объектов из записей, как в get_passwords и
+get_notes (без БД). Запуск: python bench/rows.py
+"""
+import time
+from datetime import datetime
+
+import common  # noqa: F401  (путь к коду бота)
+from models import Note, NoteRow, PasswordEntry, PasswordRow
+
+ROUNDS = 200
+
+
+def rows_per_second(build, records) -> float:
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        build(records)
+    return ROUNDS * len(records) / (time.perf_counter() - started)
+
+
+def main() -> None:
+    now = datetime.now()
+    for size in (15, 1000):
+        passwords = [(i, 1, f"Passw0rd{i:05d}", now) for i in range(size)]
+        notes = [(i, 1, i, f"заметка {i}", now) for i in range(size)]
+        password_fields = ("id", "user_id", "password", "created_at")
+        note_fields = ("id", "user_id", "password_id", "content", "created_at")
+
+        results = {
+            "PasswordEntry": rows_per_second(
+                lambda rows: [PasswordEntry(**dict(zip(password_fields, r))) for r in rows], passwords
+            ),
+            "PasswordRow": rows_per_second(lambda rows: [PasswordRow(*r) for r in rows], passwords),
+            "Note": rows_per_second(
+                lambda rows: [Note(**dict(zip(note_fields, r))) for r in rows], notes
+            ),
+            "NoteRow": rows_per_second(lambda rows: [NoteRow(*r) for r in rows], notes),
+        }
+        for name, rate in results.items():
+            print(f"{size:5d} строк  {name:14s} {rate / 1e6:.2f}M строк/с")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,28 @@
 import asyncio
 import logging
-from aiogram import Bot, Dispatcher, Router, F
+from typing import Optional
+from aiogram import BaseMiddleware, Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
-from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
-from aiogram.fsm.context import FSMContext
-from aiogram.fsm.state import State, StatesGroup
 
-from config import TOKEN
+from config import TOKEN, BOT_MODE, BOT_WORKERS, WEBHOOK_SHUTDOWN_TIMEOUT, TG_GLOBAL_RATE
 from database import create_pool, init_db
+from crud import warm_user_cache
+from purge import run_purge_worker
+from backfill import run_backfills
+from webhook import run_webhook
+from workers import WorkerPool, UpdateForwarder
+from middlewares import UserQueueMiddleware, CachedFSMContextMiddleware
+from outbound import OutboundScheduler
+from storage import create_storage
+from routes import check_routes
+from callback_tokens import router as callback_tokens_router
 from commands import router as commands_router
 from callbacks import router as callbacks_router
 from password_check import router as password_check_router
-from keyboards import main_menu
-from decorators import message_cleaner, MessageManager
-from hibp_checker import check_hibp
+from notes import router as notes_router
+from inline import router as inline_router, pool as inline_pool
+from hibp_checker import close_hibp_session
 
 logging.basicConfig(
     level=logging.INFO,
@@ -23,81 +31,35 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-hibp_router = Router()
 
+def create_dispatcher(forwarder: Optional[BaseMiddleware] = None) -> Dispatcher:
+    """Диспетчер со всеми роутерами (в каждом процессе-обработчике — свой).
 
-class HIBPCheckStates(StatesGroup):
-    AWAITING_HIBP_PASSWORD = State()
-
-
-@hibp_router.callback_query(F.data == "check_hibp")
-@message_cleaner
-async def start_hibp_check(callback: CallbackQuery, state: FSMContext):
-    """Инициирует проверку пароля через HIBP"""
-    try:
-        await callback.answer("🔒 Отправь пароль для проверки через HIBP...", show_alert=True)
-
-        await callback.message.delete()
-
-        await state.set_state(HIBPCheckStates.AWAITING_HIBP_PASSWORD)
-
-        msg = await callback.message.answer(
-            "✍️ <b>Введите пароль для проверки через HIBP:</b>\n"
-            "▫️ Минимальная длина: 8 символов\n"
-            "▫️ Проверка через Have I Been Pwned",
-            parse_mode=ParseMode.HTML,
-            reply_markup=InlineKeyboardMarkup(
-                inline_keyboard=[
-                    [InlineKeyboardButton(text="❌ Отмена", callback_data="main_menu")]
-                ]
-            )
+    С forwarder обновления не обрабатываются, а передаются в процессы-
+    обработчики: очередь пользователя и FSM тогда работают уже там.
+    """
+    storage = create_storage() if forwarder is None else None
+    dp = Dispatcher(storage=storage, disable_fsm=True)
+    if storage is not None and dp.storage is not storage:
+        # Dispatcher подставляет MemoryStorage вместо «ложного» хранилища
+        raise RuntimeError(
+            f"Dispatcher заменил {type(storage).__name__} на {type(dp.storage).__name__}"
         )
-
-        manager = MessageManager()
-        manager.track(msg)
-        await state.update_data(manager=manager)
-
-    except Exception as e:
-        logger.error(f"Ошибка инициализации HIBP проверки: {e}")
-        await callback.answer("⚠️ Ошибка инициализации", show_alert=True)
-
-
-@hibp_router.message(HIBPCheckStates.AWAITING_HIBP_PASSWORD)
-@message_cleaner
-async def process_hibp_check(message: Message, state: FSMContext):
-    """Обрабатывает введенный пароль и проверяет через HIBP"""
-    try:
-        password = message.text.strip()
-
-        if len(password) < 8:
-            await message.answer(
-                "⚠️ Пароль должен быть минимум 8 символов!",
-                reply_markup=main_menu()
-            )
-            await state.clear()
-            return
-
-        result = await check_hibp(password)
-
-        response = (
-            f"🔍 Проверка пароля через HIBP:\n<code>{password}</code>\n\n"
-            f"{result if result else '⚠️ Ошибка проверки через HIBP'}"
+    if forwarder is not None:
+        dp.update.outer_middleware(forwarder)
+    else:
+        dp.update.outer_middleware(UserQueueMiddleware())
+        dp.update.outer_middleware(
+            CachedFSMContextMiddleware(dp.storage, dp.fsm.events_isolation)
         )
 
-        await message.answer(
-            response,
-            parse_mode=ParseMode.HTML,
-            reply_markup=main_menu()
-        )
-        await state.clear()
-
-    except Exception as e:
-        logger.error(f"Ошибка обработки HIBP: {e}")
-        await message.answer(
-            "⚠️ Произошла ошибка при проверке",
-            reply_markup=main_menu()
-        )
-        await state.clear()
+    dp.include_router(commands_router)
+    dp.include_router(callback_tokens_router)
+    dp.include_router(inline_router)
+    dp.include_router(password_check_router)
+    dp.include_router(notes_router)
+    dp.include_router(callbacks_router)
+    return dp
 
 
 async def main() -> None:
@@ -111,27 +73,53 @@ async def main() -> None:
             token=TOKEN,
             default=DefaultBotProperties(parse_mode=ParseMode.HTML)
         )
+        bot.session.middleware(OutboundScheduler(TG_GLOBAL_RATE / max(1, BOT_WORKERS)))
 
-        dp = Dispatcher()
-
-        dp.include_router(commands_router)
-        dp.include_router(password_check_router)
-        dp.include_router(callbacks_router)
-        dp.include_router(hibp_router)
+        if BOT_WORKERS > 0:
+            # Этот процесс только принимает обновления, обработчики — в воркерах
+            workers = WorkerPool(BOT_WORKERS, create_dispatcher)
+            dp = create_dispatcher(UpdateForwarder(workers))
+        else:
+            dp = create_dispatcher()
+        check_routes(dp)
 
         await init_db()
         logger.info("✅ Database schema initialized")
 
-        await bot.delete_webhook(drop_pending_updates=True)
-        logger.info("🚀 Bot started in polling mode...")
-        await dp.start_polling(bot)
+        await warm_user_cache()
+        if BOT_WORKERS == 0:
+            inline_pool.warm()
+        purge_task = asyncio.create_task(run_purge_worker())
+        backfill_task = asyncio.create_task(run_backfills())
+
+        if BOT_WORKERS > 0:
+            workers.start()
+            supervisor_task = asyncio.create_task(workers.supervise())
+
+        if BOT_MODE == "webhook":
+            await run_webhook(bot, dp)
+        else:
+            await bot.delete_webhook(drop_pending_updates=True)
+            logger.info("🚀 Bot started in polling mode...")
+            await dp.start_polling(bot, handle_as_tasks=BOT_WORKERS == 0)
 
     except Exception as e:
         logger.critical(f"🔥 Critical error: {e}", exc_info=True)
     finally:
-        from database import _pool
+        if 'purge_task' in locals():
+            purge_task.cancel()
+        if 'backfill_task' in locals():
+            backfill_task.cancel()
+        if 'supervisor_task' in locals():
+            supervisor_task.cancel()
+            await workers.stop(WEBHOOK_SHUTDOWN_TIMEOUT)
+        await close_hibp_session()
+        if 'dp' in locals():
+            await dp.storage.close()
+        from database import _pool, pool_stats, close_pools
         if _pool:
-            await _pool.close()
+            logger.info(f"📊 Статистика пула: {pool_stats.snapshot()}")
+            await close_pools()
             logger.info("🗄 Connection pool closed")
         if 'bot' in locals():
             await bot.close()
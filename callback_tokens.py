@@ -0,0 +1,94 @@
+import base64
+import binascii
+import logging
+import secrets
+import struct
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from aiogram import Bot, F, Router
+from aiogram.fsm.context import FSMContext
+from aiogram.types import CallbackQuery
+
+from cache import TTLCache
+from config import CALLBACK_TOKEN_TTL, CALLBACK_TOKEN_CACHE_SIZE
+
+logger = logging.getLogger(__name__)
+router = Router()
+
+# Символа нет в алфавите base64url и в обычных callback_data бота
+TOKEN_PREFIX = "~"
+# Код действия (1 байт) + случайный ключ записи (6 байт) = 10 символов base64
+_TOKEN = struct.Struct(">B6s")
+_KEY_BYTES = 6
+
+EXPIRED_TEXT = "⌛ Кнопка устарела, откройте меню заново"
+NOT_FOUND_TEXT = "⚠️ Пароль не найден: он удалён или перенесён в архив"
+
+ActionHandler = Callable[[CallbackQuery, Any, FSMContext, Bot], Awaitable[Any]]
+
+
+class Action(IntEnum):
+    """Коды действий кнопок с токеном; значения не переиспользуются"""
+    COPY = 1
+    CHECK = 2
+
+
+# ключ -> (код действия, user_id владельца, значение)
+_tokens = TTLCache(maxsize=CALLBACK_TOKEN_CACHE_SIZE, ttl=CALLBACK_TOKEN_TTL)
+_actions: Dict[int, ActionHandler] = {}
+
+
+def encode(action: int, key: bytes) -> str:
+    packed = _TOKEN.pack(action, key)
+    return TOKEN_PREFIX + base64.urlsafe_b64encode(packed).rstrip(b"=").decode()
+
+
+def decode(data: str) -> Optional[Tuple[int, bytes]]:
+    raw = data[len(TOKEN_PREFIX):]
+    try:
+        return _TOKEN.unpack(base64.urlsafe_b64decode(raw + "=" * (-len(raw) % 4)))
+    except (binascii.Error, struct.error):
+        return None
+
+
+def issue(action: Action, user_id: int, value: Any) -> str:
+    """callback_data для кнопки действия; само значение остаётся на сервере.
+
+    Значение — идентификатор записи (например, ID пароля), а не секрет:
+    открытый текст обработчик получает из БД в момент нажатия.
+
+    Токены живут в памяти процесса (CALLBACK_TOKEN_TTL, не больше
+    CALLBACK_TOKEN_CACHE_SIZE): при BOT_WORKERS > 0 нажатия пользователя
+    приходят в тот же процесс, после перезапуска кнопка просто устаревает.
+    """
+    key = secrets.token_bytes(_KEY_BYTES)
+    _tokens.set(key, (action, user_id, value))
+    return encode(action, key)
+
+
+def action(code: Action) -> Callable[[ActionHandler], ActionHandler]:
+    """Регистрирует обработчик действия: handler(callback, value, state, bot)"""
+    def register(handler: ActionHandler) -> ActionHandler:
+        if code in _actions:
+            raise ValueError(f"Действие {code.name} уже зарегистрировано")
+        _actions[code] = handler
+        return handler
+    return register
+
+
+@router.callback_query(F.data.startswith(TOKEN_PREFIX))
+async def dispatch_token(callback: CallbackQuery, state: FSMContext, bot: Bot):
+    """Единая точка входа кнопок с токеном: выбор обработчика по коду действия"""
+    decoded = decode(callback.data)
+    entry = _tokens.get(decoded[1]) if decoded else None
+    if entry is None or entry[0] != decoded[0] or entry[1] != callback.from_user.id:
+        await callback.answer(EXPIRED_TEXT, show_alert=True)
+        return None
+
+    handler = _actions.get(entry[0])
+    if handler is None:
+        logger.warning(f"Нет обработчика для действия {entry[0]}")
+        await callback.answer(EXPIRED_TEXT, show_alert=True)
+        return None
+    return await handler(callback, entry[2], state, bot)
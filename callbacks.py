@@ -1,34 +1,38 @@
+import html
 import logging
 from typing import cast
 from aiogram import Router, F, Bot
 from aiogram.enums import ParseMode
 from aiogram.fsm.context import FSMContext
-from aiogram.types import Message, CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup
-from aiogram.fsm.state import State, StatesGroup
+from aiogram.types import Message, CallbackQuery
 
+from callback_tokens import NOT_FOUND_TEXT, Action, action
 from decorators import message_cleaner, MessageManager
 from crud import (
     save_password,
+    get_password,
     get_passwords,
     get_password_count,
     delete_password,
-    get_user,
-    register_user
+    ensure_user,
+    get_archive_block,
+    get_archive_block_count,
+    PASSWORD_ORDERS
 )
 from keyboards import (
     main_menu,
     password_length_keyboard,
     passwords_pagination,
+    archive_pagination,
     after_generation_keyboard
 )
 from password import generate_password, estimate_crack_time
-from security import calculate_password_strength, check_hibp
+from security import calculate_password_strength
 
 logger = logging.getLogger(__name__)
 router = Router()
 
-class HIBPCheckStates(StatesGroup):
-    AWAITING_HIBP_PASSWORD = State()
+REUSED_WARNING = "\n\n♻️ Такой пароль уже есть в вашем списке"
 
 @router.callback_query(F.data == "generate")
 @message_cleaner
@@ -50,27 +54,29 @@ async def process_password(callback: CallbackQuery, state: FSMContext):
 
     await state.update_data(last_length=length)
 
-    if not await get_user(user_id):
-        await register_user(user_id, callback.from_user.username or "")
+    await ensure_user(user_id, callback.from_user.username)
 
     try:
-        await save_password(user_id, password)
+        password_id, reused = await save_password(user_id, password)
         await callback.message.edit_text(
-            f"🔐 Ваш пароль:\n<code>{password}</code>",
+            f"🔐 Ваш пароль:\n<code>{html.escape(password)}</code>" + (REUSED_WARNING if reused else ""),
             parse_mode="HTML",
-            reply_markup=after_generation_keyboard(password, length)
+            reply_markup=after_generation_keyboard(password_id, length, user_id)
         )
     except Exception as e:
         logger.error(f"Ошибка сохранения: {e}")
         await callback.answer("⚠️ Ошибка генерации")
 
-@router.callback_query(F.data.startswith("copy_"))
-async def copy_password(callback: CallbackQuery, bot: Bot):
-    password = callback.data.split("_", 1)[1]
+@action(Action.COPY)
+async def copy_password(callback: CallbackQuery, password_id: int, state: FSMContext, bot: Bot):
     try:
+        password = await get_password(callback.from_user.id, password_id)
+        if password is None:
+            await callback.answer(NOT_FOUND_TEXT, show_alert=True)
+            return
         await bot.send_message(
             chat_id=callback.message.chat.id,
-            text=f"📋 Скопируйте ваш пароль:\n<code>{password}</code>",
+            text=f"📋 Скопируйте ваш пароль:\n<code>{html.escape(password)}</code>",
             parse_mode=ParseMode.HTML
         )
         await callback.answer("✅ Успешно скопировано!", show_alert=True)
@@ -82,33 +88,74 @@ async def copy_password(callback: CallbackQuery, bot: Bot):
 @message_cleaner
 async def delete_password_handler(callback: CallbackQuery, state: FSMContext):
     password_id = int(callback.data.split("_")[1])
-    if await delete_password(password_id):
+    if await delete_password(password_id, callback.from_user.id):
         await callback.answer("🗑️ Удалено!", show_alert=True)
         await show_passwords_list(callback, state)
     else:
         await callback.answer("⚠️ Ошибка", show_alert=True)
 
 @router.callback_query(F.data == "pswd_list")
+@router.callback_query(F.data.startswith("pswd_page_"))
 @message_cleaner
 async def show_passwords_list(callback: CallbackQuery, state: FSMContext):
     user_id = cast(int, callback.from_user.id)
     try:
-        total = await get_password_count(user_id)
+        page, order = 1, "new"
+        if callback.data.startswith("pswd_page_"):
+            _, _, page_text, order = callback.data.split("_", 3)
+            page = int(page_text)
+        if order not in PASSWORD_ORDERS:
+            order = "new"
+
+        total = await get_password_count(user_id, order)
         per_page = 15
         total_pages = max((total + per_page - 1) // per_page, 1)
-        passwords = await get_passwords(user_id, 1, per_page)
+        page = max(1, min(page, total_pages))
+        passwords = await get_passwords(user_id, page, per_page, order)
 
         msg = await callback.message.answer(
             "🔑 Список паролей:",
-            reply_markup=passwords_pagination(1, total_pages, passwords, per_page)
+            reply_markup=passwords_pagination(page, total_pages, passwords, user_id, per_page, order)
         )
         data = await state.get_data()
         if 'manager' in data:
             data['manager'].track(msg)
+            await state.update_data(manager=data['manager'])
     except Exception as e:
         logger.error(f"Ошибка: {e}")
         await callback.answer("⛔ Ошибка загрузки")
 
+@router.callback_query(F.data == "pswd_archive")
+@router.callback_query(F.data.startswith("archive_page_"))
+@message_cleaner
+async def show_archive(callback: CallbackQuery, state: FSMContext):
+    user_id = cast(int, callback.from_user.id)
+    try:
+        page = int(callback.data.rsplit("_", 1)[1]) if callback.data.startswith("archive_page_") else 1
+        total_pages = await get_archive_block_count(user_id)
+        if not total_pages:
+            await callback.answer("🗄 Архив пуст", show_alert=True)
+            return
+
+        page = max(1, min(page, total_pages))
+        archived = await get_archive_block(user_id, page - 1)
+        lines = "\n".join(
+            f"<code>{html.escape(item.password)}</code> — {item.created_at:%d.%m.%Y %H:%M}"
+            for item in archived
+        )
+        msg = await callback.message.answer(
+            f"🗄 <b>Архив паролей</b>\n\n{lines}",
+            parse_mode=ParseMode.HTML,
+            reply_markup=archive_pagination(page, total_pages)
+        )
+        data = await state.get_data()
+        if 'manager' in data:
+            data['manager'].track(msg)
+            await state.update_data(manager=data['manager'])
+    except Exception as e:
+        logger.error(f"Ошибка: {e}")
+        await callback.answer("⛔ Ошибка загрузки архива")
+
 @router.callback_query(F.data == "main_menu")
 @message_cleaner
 async def return_to_main(callback: CallbackQuery, state: FSMContext):
@@ -133,66 +180,31 @@ async def regenerate_password(callback: CallbackQuery, state: FSMContext, bot: B
         new_password = generate_password(str(length))
         user_id = callback.from_user.id
 
-        await save_password(user_id, new_password)
+        password_id, reused = await save_password(user_id, new_password)
+        text = f"🔐 Новый пароль:\n<code>{html.escape(new_password)}</code>" + (REUSED_WARNING if reused else "")
 
         try:
             await callback.message.edit_text(
-                f"🔐 Новый пароль:\n<code>{new_password}</code>",
+                text,
                 parse_mode=ParseMode.HTML,
-                reply_markup=after_generation_keyboard(new_password, length)
+                reply_markup=after_generation_keyboard(password_id, length, user_id)
             )
         except Exception:
             msg = await callback.message.answer(
-                f"🔐 Новый пароль:\n<code>{new_password}</code>",
+                text,
                 parse_mode=ParseMode.HTML,
-                reply_markup=after_generation_keyboard(new_password, length)
+                reply_markup=after_generation_keyboard(password_id, length, user_id)
             )
             data = await state.get_data()
             if manager := data.get('manager'):
                 manager.track(msg)
+                await state.update_data(manager=manager)
 
         await callback.answer()
     except Exception as e:
         logger.error(f"Ошибка регенерации: {e}", exc_info=True)
         await callback.answer("⚠️ Ошибка генерации", show_alert=True)
 
-@router.callback_query(F.data.startswith("check_"))
-@message_cleaner
-async def handle_password_check(callback: CallbackQuery, state: FSMContext, bot: Bot):
-    try:
-        password = callback.data.split("_", 1)[1]
-        report, recommendations = calculate_password_strength(password)
-        recommendations_text = "\n".join(
-            f"• {rec}" for rec in recommendations) if recommendations else "✅ Пароль соответствует базовым требованиям"
-
-        response = (
-            f"🔍 Анализ пароля:\n<code>{password}</code>\n\n"
-            f"📈 Энтропия: {report['entropy']:.1f} бит\n"
-            f"⚖️ Сложность: {report['score']:.1f}/100\n\n"
-            f"📝 Рекомендации:\n{recommendations_text}"
-        )
-
-        await bot.delete_message(
-            chat_id=callback.message.chat.id,
-            message_id=callback.message.message_id
-        )
-
-        msg = await callback.message.answer(
-            response,
-            parse_mode=ParseMode.HTML,
-            reply_markup=main_menu()
-        )
-
-        data = await state.get_data()
-        manager = data.get('manager', MessageManager())
-        manager.track(msg)
-        await state.update_data(manager=manager)
-    except Exception as e:
-        logger.error(f"Ошибка проверки: {e}")
-        await callback.answer("⚠️ Ошибка анализа", show_alert=True)
-    finally:
-        await state.clear()
-
 @router.message(F.text)
 @message_cleaner
 async def handle_text_message(message: Message, state: FSMContext):
@@ -209,7 +221,7 @@ async def handle_text_message(message: Message, state: FSMContext):
         recommendations_text = "\n".join(f"• {rec}" for rec in recommendations)
 
         response = (
-            f"🔍 Анализ пароля:\n<code>{password}</code>\n\n"
+            f"🔍 Анализ пароля:\n<code>{html.escape(password)}</code>\n\n"
             f"📈 Энтропия: {report.get('entropy', 0):.1f} бит\n"
             f"⚖️ Сложность: {report.get('score', 0):.1f}/100\n\n"
             f"⏳ Время взлома:\n"
@@ -224,96 +236,3 @@ async def handle_text_message(message: Message, state: FSMContext):
     except Exception as e:
         logger.error(f"Ошибка обработки: {e}")
         await message.answer("🔒 Введите пароль для проверки через главное меню")
-
-@router.callback_query(F.data.startswith("check_password_"))
-@message_cleaner
-async def handle_existing_check(callback: CallbackQuery, state: FSMContext, bot: Bot):
-    try:
-        password = callback.data.split("check_password_", 1)[1]
-        report, recommendations = calculate_password_strength(password)
-        recommendations_text = "\n".join(f"• {rec}" for rec in recommendations)
-
-        response = (
-            f"🔍 <b>Анализ сгенерированного пароля:</b>\n<code>{password}</code>\n\n"
-            f"{report}\n\n"
-            f"📝 <b>Рекомендации:</b>\n{recommendations_text}"
-        )
-
-        await bot.delete_message(
-            chat_id=callback.message.chat.id,
-            message_id=callback.message.message_id
-        )
-
-        msg = await callback.message.answer(response, parse_mode=ParseMode.HTML, reply_markup=main_menu())
-        data = await state.get_data()
-        if manager := data.get('manager'):
-            manager.track(msg)
-
-        await state.clear()
-        await callback.answer()
-    except Exception as e:
-        logger.error(f"Ошибка: {e}")
-        await callback.answer("⚠️ Ошибка проверки", show_alert=True)
-
-@router.callback_query(F.data == "check_hibp")
-@message_cleaner
-async def start_hibp_check(callback: CallbackQuery, state: FSMContext):
-    try:
-        await callback.answer("🔒 Отправь пароль для проверки через HIBP...", show_alert=True)
-        await callback.message.delete()
-
-        await state.set_state(HIBPCheckStates.AWAITING_HIBP_PASSWORD)
-        msg = await callback.message.answer(
-            "✍️ <b>Введите пароль для проверки через HIBP:</b>\n"
-            "▫️ Минимальная длина: 8 символов\n"
-            "▫️ Проверяется утечка в базе Have I Been Pwned",
-            parse_mode=ParseMode.HTML,
-            reply_markup=InlineKeyboardMarkup(
-                inline_keyboard=[
-                    [InlineKeyboardButton(text="❌ Отмена", callback_data="main_menu")]
-                ]
-            )
-        )
-
-        manager = MessageManager()
-        manager.track(msg)
-        await state.update_data(manager=manager)
-    except Exception as e:
-        logger.error(f"Ошибка инициализации проверки HIBP: {e}")
-        await callback.answer("⚠️ Ошибка инициализации", show_alert=True)
-
-@router.message(HIBPCheckStates.AWAITING_HIBP_PASSWORD)
-@message_cleaner
-async def process_hibp_check(message: Message, state: FSMContext):
-    try:
-        password = message.text.strip()
-        if len(password) < 8:
-            msg = await message.answer(
-                "⚠️ Пароль должен быть минимум 8 символов!",
-                reply_markup=main_menu()
-            )
-            manager = MessageManager()
-            manager.track(msg)
-            await state.update_data(manager=manager)
-            await state.clear()
-            return
-
-        is_pwned, count = await check_hibp(password)
-        response = (
-            f"🔍 Проверка пароля через HIBP:\n<code>{password}</code>\n\n"
-            f"{'⚠️ Пароль найден в утечках!' if is_pwned else '✅ Пароль не найден в утечках'}\n"
-            f"Количество утечек: {count if is_pwned else 0}"
-        )
-
-        msg = await message.answer(response, parse_mode=ParseMode.HTML, reply_markup=main_menu())
-        manager = MessageManager()
-        manager.track(msg)
-        await state.update_data(manager=manager)
-    except Exception as e:
-        logger.error(f"Ошибка проверки HIBP: {e}")
-        msg = await message.answer("⚠️ Ошибка при проверке HIBP", reply_markup=main_menu())
-        manager = MessageManager()
-        manager.track(msg)
-        await state.update_data(manager=manager)
-    finally:
-        await state.clear()
\ No newline at end of file
@@ -1,15 +1,20 @@
-from aiogram import Router, F
+import tempfile
+from collections import defaultdict
+from datetime import date, timedelta
+from aiogram import Router, F, Bot
 from aiogram.types import Message, CallbackQuery, User as TgUser
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
 from aiogram.enums import ParseMode
 from aiogram.fsm.context import FSMContext
 from typing import Optional, cast
 
 from crud import (
-    get_user,
-    register_user,
+    ensure_user,
     get_password_count,
-    get_passwords
+    get_passwords,
+    clear_all_data,
+    get_purge_progress,
+    get_user_stats
 )
 from keyboards import (
     main_menu,
@@ -17,11 +22,18 @@ from keyboards import (
     passwords_pagination,
 )
 from callbacks import MessageManager
+from export import export_vault, EXPORT_FORMATS
+from importer import import_document
+from purge import wake_purge_worker
 import logging
 
 router = Router()
 logger = logging.getLogger(__name__)
 
+# Здесь только команды и импорт документа: прочие сообщения (ввод паролей,
+# заметок) проходят роутер за одну проверку
+router.message.filter(F.document | F.text.startswith("/"))
+
 
 @router.message(Command("start"))
 async def start_command(message: Message, state: FSMContext) -> None:
@@ -35,9 +47,7 @@ async def start_command(message: Message, state: FSMContext) -> None:
         if not user:
             raise ValueError("Не получен объект пользователя")
 
-        existing_user = await get_user(user.id)
-        if not existing_user:
-            await register_user(user.id, user.username or "")
+        await ensure_user(user.id, user.username)
 
         welcome_msg = (
             f"👋 <b>Добро пожаловать, {user.username or 'Пользователь'}!</b>\n\n"
@@ -64,6 +74,9 @@ async def help_command(message: Message) -> None:
         "<b>📚 Доступные команды:</b>\n\n"
         "🔐 /generate - Генерация пароля\n"
         "📋 /list - Список паролей\n"
+        "📊 /stats - Статистика\n"
+        "📤 /export [csv|json] [gz] - Выгрузка паролей и заметок\n"
+        "📥 Отправьте CSV/JSON файл из /export для импорта\n"
         "⚙️ Используйте кнопки меню"
     )
     await message.answer(help_text, parse_mode=ParseMode.HTML)
@@ -78,7 +91,6 @@ async def list_passwords_command(message: Message, state: FSMContext) -> None:
 
         if not manager:
             manager = MessageManager()
-            await state.update_data(manager=manager)
 
         user_id: Optional[int] = message.from_user.id
         if not user_id:
@@ -89,13 +101,14 @@ async def list_passwords_command(message: Message, state: FSMContext) -> None:
 
         per_page = 15
         total_pages = max((cast(int, total) + per_page - 1) // per_page, 1)
-        reply_markup = passwords_pagination(1, total_pages, passwords, per_page)
+        reply_markup = passwords_pagination(1, total_pages, passwords, user_id, per_page)
 
         msg = await message.answer(
             "🔑 Список паролей:" if passwords else "📭 Нет данных",
             reply_markup=reply_markup
         )
         manager.track(msg)
+        await state.update_data(manager=manager)
 
     except Exception as e:
         logger.error(f"Ошибка: {e}", exc_info=True)
@@ -107,14 +120,10 @@ async def list_passwords_command(message: Message, state: FSMContext) -> None:
 async def process_clear_all(callback: CallbackQuery, state: FSMContext) -> None:
     """Обработка подтверждения очистки"""
     try:
-        data = await state.get_data()
-        manager: Optional[MessageManager] = data.get('manager')
-        user_id: Optional[int] = data.get('user_id')
+        await clear_all_data(callback.from_user.id)
+        wake_purge_worker()
 
-        if not all([manager, user_id]):
-            raise ValueError("Недостаточно данных для очистки")
-
-        await callback.message.edit_text("✅ Данные удалены")
+        await callback.message.edit_text("✅ Данные удалены\n🧹 Ход фоновой очистки — в /stats")
         await callback.message.edit_reply_markup(reply_markup=main_menu())
 
     except Exception as e:
@@ -131,14 +140,119 @@ async def generate_command(message: Message, state: FSMContext) -> None:
 
         if not manager:
             manager = MessageManager()
-            await state.update_data(manager=manager)
 
         msg = await message.answer(
             "🔢 Выберите длину:",
             reply_markup=password_length_keyboard()
         )
         manager.track(msg)
+        await state.update_data(manager=manager)
 
     except Exception as e:
         logger.error(f"Ошибка: {e}", exc_info=True)
         await message.answer("⚠️ Ошибка инициализации")
+
+
+@router.message(Command("export"))
+async def export_command(message: Message, command: CommandObject) -> None:
+    """Выгрузка всех паролей и заметок пользователя документом"""
+    args = (command.args or "").lower().split()
+    fmt = next((arg for arg in args if arg in EXPORT_FORMATS), "csv")
+    compress = "gz" in args or "gzip" in args
+
+    document = None
+    try:
+        document = await export_vault(message.from_user.id, fmt, compress)
+        await message.answer_document(document, caption="📤 Экспорт данных")
+    except Exception as e:
+        logger.error(f"Ошибка экспорта: {e}", exc_info=True)
+        await message.answer("⚠️ Ошибка экспорта")
+    finally:
+        if document:
+            document.close()
+
+
+@router.message(F.document)
+async def import_command(message: Message, bot: Bot) -> None:
+    """Импорт паролей и заметок из присланного CSV/JSON документа"""
+    document = message.document
+    try:
+        with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as file:
+            await bot.download(document, destination=file)
+            stats = await import_document(
+                message.from_user.id,
+                message.from_user.username,
+                file,
+                document.file_name or ""
+            )
+
+        response = (
+            f"📥 <b>Импорт завершён</b>\n"
+            f"🔑 Паролей: {stats.passwords}\n"
+            f"📝 Заметок: {stats.notes}"
+        )
+        if stats.rejected:
+            errors = "\n".join(f"• {error}" for error in stats.errors)
+            response += f"\n⚠️ Отклонено строк: {stats.rejected}\n{errors}"
+        await message.answer(response, parse_mode=ParseMode.HTML, reply_markup=main_menu())
+    except ValueError as e:
+        await message.answer(f"⚠️ {e}")
+    except Exception as e:
+        logger.error(f"Ошибка импорта: {e}", exc_info=True)
+        await message.answer("⚠️ Ошибка импорта")
+
+
+STATS_ACTIVITY_DAYS = 14
+
+
+@router.message(Command("stats"))
+async def stats_command(message: Message) -> None:
+    """Дашборд статистики из инкрементальных агрегатов password_stats"""
+    try:
+        rows = await get_user_stats(message.from_user.id)
+        purge = await get_purge_progress(message.from_user.id)
+
+        created = sum(row['created'] for row in rows)
+        stored = created - sum(row['deleted'] for row in rows)
+        scored = sum(row['scored'] for row in rows)
+        score_sum = sum(row['score_sum'] for row in rows)
+        breached = sum(row['breached'] for row in rows)
+
+        by_length = defaultdict(int)
+        by_day = defaultdict(int)
+        for row in rows:
+            by_length[row['length']] += row['created']
+            by_day[row['day']] += row['created']
+
+        lengths = ", ".join(
+            f"{length} — {count}" for length, count in sorted(by_length.items()) if count
+        ) or "—"
+        today = date.today()
+        activity = "\n".join(
+            f"{day:%d.%m}: {'▇' * min(by_day[day], 20)} {by_day[day]}"
+            for day in (today - timedelta(days=offset) for offset in range(STATS_ACTIVITY_DAYS - 1, -1, -1))
+            if by_day[day]
+        ) or "нет активности"
+        average = f"{score_sum / scored:.1f}/100" if scored else "—"
+        purging = ""
+        if purge and purge['finished_at'] is None:
+            purging = (
+                f"\n\n🧹 Идёт очистка данных: удалено паролей {purge['deleted_passwords']}, "
+                f"заметок {purge['deleted_notes']}"
+            )
+
+        await message.answer(
+            "📊 <b>Статистика</b>\n\n"
+            f"🔐 Сгенерировано всего: {created}\n"
+            f"💾 Хранится: {stored}\n"
+            f"📏 По длине: {lengths}\n"
+            f"⚖️ Средняя сложность: {average}\n"
+            f"🚨 Найдено в утечках: {breached}\n\n"
+            f"📅 <b>Активность за {STATS_ACTIVITY_DAYS} дней:</b>\n{activity}"
+            + purging,
+            parse_mode=ParseMode.HTML,
+            reply_markup=main_menu()
+        )
+    except Exception as e:
+        logger.error(f"Ошибка статистики: {e}", exc_info=True)
+        await message.answer("⚠️ Ошибка загрузки статистики")
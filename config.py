@@ -1,6 +1,7 @@
+import hashlib
 import os
 from dotenv import load_dotenv
-from typing import Optional
+from typing import List, Optional
 from urllib.parse import quote_plus
 
 
@@ -32,5 +33,89 @@ try:
         f"postgresql://{PG_USER}:{PG_PASSWORD}@{PG_HOST}:{PG_PORT}/{PG_DB}"
     )
 
+    PG_POOL_MIN_SIZE: int = int(get_env("PG_POOL_MIN_SIZE", "5"))
+    PG_POOL_MAX_SIZE: int = int(get_env("PG_POOL_MAX_SIZE", "20"))
+    PG_COMMAND_TIMEOUT: float = float(get_env("PG_COMMAND_TIMEOUT", "60"))
+    SLOW_QUERY_MS: float = float(get_env("SLOW_QUERY_MS", "200"))
+
+    # Реплики для чтения: DSN через запятую
+    PG_REPLICA_URLS: List[str] = [
+        dsn.strip() for dsn in get_env("PG_REPLICA_URLS", "").split(",")
+        if dsn.strip()
+    ]
+    # >0: passwords/notes переводятся на PARTITION BY HASH (user_id)
+    PG_HASH_PARTITIONS: int = int(get_env("PG_HASH_PARTITIONS", "0"))
+    READ_YOUR_WRITES_SECONDS: float = float(get_env("READ_YOUR_WRITES_SECONDS", "5"))
+    REPLICA_ACQUIRE_TIMEOUT: float = float(get_env("REPLICA_ACQUIRE_TIMEOUT", "2"))
+    REPLICA_RETRY_SECONDS: float = float(get_env("REPLICA_RETRY_SECONDS", "30"))
+
+    PURGE_BATCH_SIZE: int = int(get_env("PURGE_BATCH_SIZE", "1000"))
+    PURGE_PAUSE_SECONDS: float = float(get_env("PURGE_PAUSE_SECONDS", "0.2"))
+    PURGE_POLL_SECONDS: float = float(get_env("PURGE_POLL_SECONDS", "30"))
+
+    # Ключ HMAC для дайджестов паролей; смена ключа ломает поиск повторов
+    PASSWORD_DIGEST_KEY: str = get_env("PASSWORD_DIGEST_KEY", TOKEN)
+    # Мастер-ключ AES-256 в base64; пусто — пароли хранятся открыто
+    PASSWORD_MASTER_KEY: str = get_env("PASSWORD_MASTER_KEY", "")
+    DATA_KEY_CACHE_SIZE: int = int(get_env("DATA_KEY_CACHE_SIZE", "10000"))
+    BACKFILL_BATCH_SIZE: int = int(get_env("BACKFILL_BATCH_SIZE", "1000"))
+
+    USER_CACHE_SIZE: int = int(get_env("USER_CACHE_SIZE", "100000"))
+    USER_CACHE_TTL: int = int(get_env("USER_CACHE_TTL", "3600"))
+
+    # polling | webhook
+    BOT_MODE: str = get_env("BOT_MODE", "polling")
+    # Публичный адрес, на который Telegram шлёт обновления (https://host)
+    WEBHOOK_URL: str = get_env("WEBHOOK_URL", "")
+    WEBHOOK_PATH: str = get_env("WEBHOOK_PATH", "/webhook")
+    # Секрет заголовка X-Telegram-Bot-Api-Secret-Token: A-Z, a-z, 0-9, _ и -
+    WEBHOOK_SECRET: str = get_env(
+        "WEBHOOK_SECRET", hashlib.sha256(TOKEN.encode()).hexdigest()
+    )
+    WEBHOOK_HOST: str = get_env("WEBHOOK_HOST", "0.0.0.0")
+    WEBHOOK_PORT: int = int(get_env("WEBHOOK_PORT", "8080"))
+    WEBHOOK_MAX_CONCURRENCY: int = int(get_env("WEBHOOK_MAX_CONCURRENCY", "100"))
+    WEBHOOK_SHUTDOWN_TIMEOUT: float = float(get_env("WEBHOOK_SHUTDOWN_TIMEOUT", "10"))
+
+    # Очередь обновлений одного пользователя и общий лимит обработчиков;
+    # лимит держим ниже PG_POOL_MAX_SIZE, чтобы пулу оставались соединения
+    USER_QUEUE_SIZE: int = int(get_env("USER_QUEUE_SIZE", "5"))
+    MAX_INFLIGHT_UPDATES: int = int(get_env("MAX_INFLIGHT_UPDATES", "15"))
+
+    # Исходящие запросы к Bot API: сообщений в секунду всего и на чат
+    TG_GLOBAL_RATE: float = float(get_env("TG_GLOBAL_RATE", "30"))
+    TG_CHAT_RATE: float = float(get_env("TG_CHAT_RATE", "1"))
+    TG_CHAT_BURST: float = float(get_env("TG_CHAT_BURST", "3"))
+    TG_RETRY_ATTEMPTS: int = int(get_env("TG_RETRY_ATTEMPTS", "3"))
+    TG_DELETE_BATCH_WINDOW: float = float(get_env("TG_DELETE_BATCH_WINDOW", "0.05"))
+
+    # Хранилище FSM: memory, sqlite:///путь или redis://...; TTL — с последней записи
+    FSM_STORAGE: str = get_env("FSM_STORAGE", "memory")
+    FSM_TTL: float = float(get_env("FSM_TTL", "86400"))
+    FSM_MAX_KEYS: int = int(get_env("FSM_MAX_KEYS", "100000"))
+
+    # Токены кнопок (callback_data): срок жизни и число записей в процессе
+    CALLBACK_TOKEN_TTL: float = float(get_env("CALLBACK_TOKEN_TTL", "86400"))
+    CALLBACK_TOKEN_CACHE_SIZE: int = int(get_env("CALLBACK_TOKEN_CACHE_SIZE", "100000"))
+
+    # Inline-режим: вариантов в ответе, запас готовых паролей на длину и
+    # политику, сколько секунд Telegram кэширует ответ пользователю
+    INLINE_RESULTS: int = int(get_env("INLINE_RESULTS", "5"))
+    INLINE_POOL_SIZE: int = int(get_env("INLINE_POOL_SIZE", "50"))
+    INLINE_CACHE_TIME: int = int(get_env("INLINE_CACHE_TIME", "10"))
+    INLINE_DEFAULT_LENGTH: int = int(get_env("INLINE_DEFAULT_LENGTH", "16"))
+
+    # >0: обновления принимает один процесс, обработчики работают в
+    # BOT_WORKERS процессах, распределение по user_id
+    BOT_WORKERS: int = int(get_env("BOT_WORKERS", "0"))
+    WORKER_CONCURRENCY: int = int(get_env("WORKER_CONCURRENCY", "50"))
+    WORKER_QUEUE_SIZE: int = int(get_env("WORKER_QUEUE_SIZE", "1000"))
+    WORKER_RESTART_SECONDS: float = float(get_env("WORKER_RESTART_SECONDS", "1"))
+
+    if BOT_MODE not in ("polling", "webhook"):
+        raise ConfigError(f"Неизвестный BOT_MODE: {BOT_MODE}")
+    if BOT_MODE == "webhook" and not WEBHOOK_URL:
+        raise ConfigError("Для BOT_MODE=webhook нужен WEBHOOK_URL")
+
 except Exception as e:
     raise ConfigError(f"Ошибка конфигурации: {str(e)}") from e
@@ -1,17 +1,73 @@
+import asyncio
+import json
 import logging
 import os
+import zlib
 import asyncpg
-from typing import List, Optional, cast
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Set, Tuple, cast
 
+from cache import TTLCache
+from config import USER_CACHE_SIZE, USER_CACHE_TTL
 from database import get_connection
-from models import PasswordEntry, Note, User
+from encryption import decrypt, encrypt, encryption_enabled, get_data_key, reveal_page, reveal_rows
+from security import password_digest, password_strength
+from models import Note, User, PasswordRow, NoteRow, ArchivedPassword
 
 logger = logging.getLogger(__name__)
 
+MAX_PASSWORDS_PER_USER = 1000
+
+ARCHIVE_BLOCK_SIZE = 50
+WEAK_SCORE = 60
+
+# Режимы списка паролей: (доп. условие, сортировка); «new» идёт по индексу
+# idx_passwords_user_id (user_id, id DESC), «weak»/«lt60» — по idx_passwords_score
+PASSWORD_ORDERS = {
+    "new": ("", "id DESC"),
+    "weak": ("", "score ASC, id DESC"),
+    "lt60": (f"AND score < {WEAK_SCORE}", "score ASC, id DESC"),
+}
+
+# Условия видимости строк: всё, что не старше отметки очистки (purge_jobs)
+_VISIBLE_PASSWORDS = (
+    "id > COALESCE((SELECT password_watermark FROM purge_jobs WHERE user_id = $1), 0)"
+)
+_VISIBLE_NOTES = (
+    "id > COALESCE((SELECT note_watermark FROM purge_jobs WHERE user_id = $1), 0)"
+)
+
+# Снимает самые старые видимые пароли сверх $2 для переноса в архив.
+# Переносится не меньше $3 строк, чтобы архивные блоки были крупными,
+# а не по одной строке на каждое сохранение.
+_TAKE_OVERFLOW_SQL = """
+    WITH visible AS (
+        SELECT id FROM passwords WHERE user_id = $1 AND """ + _VISIBLE_PASSWORDS + """
+    ), overflow AS (
+        SELECT id FROM visible
+        ORDER BY id ASC
+        LIMIT CASE WHEN (SELECT COUNT(*) FROM visible) > $2
+            THEN GREATEST((SELECT COUNT(*) FROM visible) - $2, $3)
+            ELSE 0 END
+    )
+    DELETE FROM passwords
+    WHERE user_id = $1 AND id IN (SELECT id FROM overflow)
+    RETURNING id, password, password_enc, created_at, ARRAY(
+        -- Заметки удалятся каскадно, поэтому уходят в архив вместе с паролем
+        SELECT (n.id, n.content, n.created_at) FROM notes n
+        WHERE n.user_id = $1 AND n.password_id = passwords.id
+        ORDER BY n.id
+    ) AS notes
+"""
+
+# user_id -> username уже зарегистрированных пользователей
+_known_users = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+_background_tasks: Set[asyncio.Task] = set()
+
 async def get_user(user_id: int) -> Optional[User]:
     """Получение информации о пользователе"""
     try:
-        async with get_connection() as conn:
+        async with get_connection(readonly=True, user_id=user_id) as conn:
             record = await conn.fetchrow(
                 "SELECT user_id, username FROM users WHERE user_id = $1",
                 user_id
@@ -24,7 +80,7 @@ async def get_user(user_id: int) -> Optional[User]:
 async def register_user(user_id: int, username: Optional[str]) -> None:
     """Регистрация/обновление пользователя"""
     try:
-        async with get_connection() as conn:
+        async with get_connection(user_id=user_id) as conn:
             await conn.execute("""
                 INSERT INTO users (user_id, username)
                 VALUES ($1, $2)
@@ -32,133 +88,578 @@ async def register_user(user_id: int, username: Optional[str]) -> None:
                 SET username = EXCLUDED.username""",
                 user_id, username or ""
             )
+        _known_users.set(user_id, username or "")
     except asyncpg.PostgresError as e:
         logger.error(f"Ошибка регистрации: {e}", exc_info=True)
         raise
 
-async def save_password(user_id: int, password: str) -> int:
-    """Сохранение пароля с лимитом 1000 записей. Возвращает ID пароля."""
+async def ensure_user(user_id: int, username: Optional[str]) -> None:
+    """Гарантирует наличие пользователя, обращаясь к БД только при необходимости.
+
+    Известный пользователь с тем же username не требует запросов. Если
+    username изменился, upsert уходит в фон. Неизвестный пользователь
+    регистрируется одним upsert до возврата, чтобы FK на users был валиден.
+    """
+    username = username or ""
+    cached = _known_users.get(user_id)
+    if cached is None:
+        await register_user(user_id, username)
+        return
+    if cached != username:
+        _known_users.set(user_id, username)
+        task = asyncio.create_task(_register_user_background(user_id, username))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+async def _register_user_background(user_id: int, username: str) -> None:
+    try:
+        await register_user(user_id, username)
+    except Exception as e:
+        _known_users.pop(user_id)
+        logger.error(f"Ошибка фонового обновления пользователя: {e}")
+
+async def warm_user_cache() -> None:
+    """Предзаполнение кэша известных пользователей при старте"""
     try:
         async with get_connection() as conn:
+            records = await conn.fetch(
+                "SELECT user_id, username FROM users LIMIT $1",
+                USER_CACHE_SIZE
+            )
+        for record in records:
+            _known_users.set(record['user_id'], record['username'] or "")
+        logger.info(f"Кэш пользователей прогрет: {len(records)}")
+    except asyncpg.PostgresError as e:
+        logger.error(f"Ошибка прогрева кэша: {e}", exc_info=True)
+
+def _archive_row(row: asyncpg.Record, password: str) -> list:
+    """Строка архивного блока: [id, пароль, created_at] и, если есть,
+    заметки к паролю [[id, текст, created_at], ...]"""
+    item = [row['id'], password, row['created_at'].isoformat()]
+    if row['notes']:
+        item.append([
+            [note_id, content, created_at.isoformat()]
+            for note_id, content, created_at in row['notes']
+        ])
+    return item
+
+def _archive_block(key, user_id: int, rows: List[asyncpg.Record]) -> tuple:
+    """Строка password_archive из пачки строк (id, password, password_enc,
+    created_at, notes), упорядоченных по id"""
+    payload = json.dumps(
+        [_archive_row(row, password) for row, password in zip(rows, reveal_rows(key, user_id, rows))],
+        separators=(",", ":")
+    )
+    block = zlib.compress(payload.encode("utf-8"))
+    # Блок шифруется целиком тем же ключом данных, что и строки passwords
+    return (
+        user_id, rows[0]['id'], rows[-1]['id'], len(rows),
+        encrypt(key, user_id, block) if key else block, key is not None
+    )
+
+def _unpack_archive_block(block: bytes) -> list:
+    return json.loads(zlib.decompress(block))
+
+async def _insert_archive_blocks(conn: asyncpg.Connection, blocks: List[tuple]) -> None:
+    await conn.executemany(
+        """INSERT INTO password_archive (user_id, first_id, last_id, row_count, block, encrypted)
+        VALUES ($1, $2, $3, $4, $5, $6)""",
+        blocks
+    )
+
+async def _archive_overflow(conn: asyncpg.Connection, user_id: int, keep: int) -> int:
+    """Переносит пароли сверх keep (с их заметками) в архив сжатыми блоками.
+    Возвращает число строк."""
+    rows = sorted(await conn.fetch(_TAKE_OVERFLOW_SQL, user_id, keep, ARCHIVE_BLOCK_SIZE))
+    if not rows:
+        return 0
+    key = await get_data_key(conn, user_id, create=True)
+    await _insert_archive_blocks(conn, [
+        _archive_block(key, user_id, rows[start:start + ARCHIVE_BLOCK_SIZE])
+        for start in range(0, len(rows), ARCHIVE_BLOCK_SIZE)
+    ])
+    return len(rows)
+
+async def save_password(user_id: int, password: str) -> Tuple[int, bool]:
+    """Сохранение пароля с лимитом 1000 записей.
+
+    Пароли сверх лимита не удаляются, а переносятся в архив (password_archive).
+    Возвращает ID пароля и признак того, что такой пароль у пользователя
+    уже есть (одна проверка по индексу (user_id, digest)). При заданном
+    PASSWORD_MASTER_KEY пароль хранится только в password_enc.
+    """
+    try:
+        async with get_connection(user_id=user_id) as conn:
             async with conn.transaction():
-                await conn.execute("""
-                    WITH to_delete AS (
-                        SELECT ctid FROM passwords
-                        WHERE user_id = $1
-                        ORDER BY id ASC
-                        LIMIT GREATEST((SELECT COUNT(*) FROM passwords WHERE user_id = $1) - 999, 0)
-                    )
-                    DELETE FROM passwords WHERE ctid IN (SELECT ctid FROM to_delete)
-                """, user_id)
+                await _archive_overflow(conn, user_id, MAX_PASSWORDS_PER_USER - 1)
 
+                key = await get_data_key(conn, user_id, create=True)
+                password_enc = encrypt(key, user_id, password.encode()) if key else None
                 record = await conn.fetchrow(
-                    "INSERT INTO passwords (user_id, password) VALUES ($1, $2) RETURNING id",
-                    user_id, password
+                    """WITH reused AS (
+                        SELECT EXISTS (
+                            SELECT 1 FROM passwords
+                            WHERE user_id = $1 AND digest = $3 AND """ + _VISIBLE_PASSWORDS + """
+                        ) AS found
+                    )
+                    INSERT INTO passwords (user_id, password, password_enc, length, digest, score, entropy)
+                    VALUES ($1, $2, $6, $7, $3, $4, $5)
+                    RETURNING id, (SELECT found FROM reused) AS reused""",
+                    user_id, None if key else password, password_digest(password),
+                    *password_strength(password), password_enc, len(password)
                 )
-                return cast(int, record['id'])
+                return cast(int, record['id']), record['reused']
     except asyncpg.PostgresError as e:
         logger.error(f"Ошибка сохранения: {e}", exc_info=True)
         raise
 
-async def get_passwords(user_id: int, page: int = 1, per_page: int = 15) -> List[PasswordEntry]:
-    """Получение паролей с пагинацией"""
+async def get_passwords(
+    user_id: int,
+    page: int = 1,
+    per_page: int = 15,
+    order: str = "new"
+) -> List[PasswordRow]:
+    """Получение паролей с пагинацией в одном из режимов PASSWORD_ORDERS"""
+    condition, order_by = PASSWORD_ORDERS[order]
     try:
-        async with get_connection() as conn:
+        async with get_connection(readonly=True, user_id=user_id) as conn:
             records = await conn.fetch(
-                """SELECT id, user_id, password, created_at
-                FROM passwords
-                WHERE user_id = $1
-                ORDER BY id DESC
+                """SELECT id, user_id, password, password_enc, created_at,
+                    EXISTS (
+                        SELECT 1 FROM passwords d
+                        WHERE d.user_id = $1 AND d.digest = p.digest AND d.id <> p.id
+                            AND """ + _VISIBLE_PASSWORDS + """
+                    ) AS reused
+                FROM passwords p
+                WHERE user_id = $1 AND """ + _VISIBLE_PASSWORDS + f"""
+                    {condition}
+                ORDER BY {order_by}
                 LIMIT $2 OFFSET $3""",
                 user_id, per_page, (page - 1) * per_page
             )
-            return [PasswordEntry(**dict(record)) for record in records]
+            passwords = await reveal_page(conn, user_id, records)
+            return [
+                PasswordRow(r['id'], r['user_id'], password, r['created_at'], r['reused'])
+                for r, password in zip(records, passwords)
+            ]
     except asyncpg.PostgresError as e:
         logger.error(f"Ошибка запроса: {e}", exc_info=True)
         raise
 
-async def get_password_count(user_id: int) -> int:
-    """Количество сохраненных паролей"""
+async def get_password(user_id: int, password_id: int) -> Optional[str]:
+    """Открытый текст одного пароля пользователя (None, если его уже нет)"""
     try:
-        async with get_connection() as conn:
+        async with get_connection(readonly=True, user_id=user_id) as conn:
+            record = await conn.fetchrow(
+                "SELECT password, password_enc FROM passwords WHERE user_id = $1 AND id = $2 AND "
+                + _VISIBLE_PASSWORDS,
+                user_id, password_id
+            )
+            if record is None:
+                return None
+            return (await reveal_page(conn, user_id, [record]))[0]
+    except asyncpg.PostgresError as e:
+        logger.error(f"Ошибка запроса: {e}", exc_info=True)
+        raise
+
+async def get_password_count(user_id: int, order: str = "new") -> int:
+    """Количество сохраненных паролей (с учётом фильтра режима order)"""
+    condition, _ = PASSWORD_ORDERS[order]
+    try:
+        async with get_connection(readonly=True, user_id=user_id) as conn:
+            return cast(int, await conn.fetchval(
+                "SELECT COUNT(*) FROM passwords WHERE user_id = $1 AND "
+                + _VISIBLE_PASSWORDS + " " + condition,
+                user_id
+            ))
+    except asyncpg.PostgresError as e:
+        logger.error(f"Ошибка подсчета: {e}", exc_info=True)
+        raise
+
+async def get_archive_block_count(user_id: int) -> int:
+    """Количество архивных блоков пользователя"""
+    try:
+        async with get_connection(readonly=True, user_id=user_id) as conn:
             return cast(int, await conn.fetchval(
-                "SELECT COUNT(*) FROM passwords WHERE user_id = $1",
+                "SELECT COUNT(*) FROM password_archive WHERE user_id = $1",
                 user_id
             ))
     except asyncpg.PostgresError as e:
         logger.error(f"Ошибка подсчета: {e}", exc_info=True)
         raise
 
+async def get_archive_block(user_id: int, index: int = 0) -> List[ArchivedPassword]:
+    """Распаковка одного архивного блока (0 — самый свежий), новые сверху"""
+    try:
+        async with get_connection(readonly=True, user_id=user_id) as conn:
+            record = await conn.fetchrow(
+                """SELECT block, encrypted FROM password_archive
+                WHERE user_id = $1
+                ORDER BY last_id DESC
+                LIMIT 1 OFFSET $2""",
+                user_id, index
+            )
+            if record is None:
+                return []
+            block = record['block']
+            if record['encrypted']:
+                block = decrypt(await get_data_key(conn, user_id), user_id, block)
+    except asyncpg.PostgresError as e:
+        logger.error(f"Ошибка запроса: {e}", exc_info=True)
+        raise
+    rows = _unpack_archive_block(block)
+    return [
+        ArchivedPassword(row_id, password, datetime.fromisoformat(created_at))
+        for row_id, password, created_at, *_ in reversed(rows)
+    ]
+
+async def get_user_stats(user_id: int) -> List[asyncpg.Record]:
+    """Агрегаты password_stats пользователя по дням и длинам (одно чтение по PK)"""
+    try:
+        async with get_connection(readonly=True, user_id=user_id) as conn:
+            return await conn.fetch(
+                """SELECT day, length, created, deleted, scored, score_sum, breached
+                FROM password_stats
+                WHERE user_id = $1""",
+                user_id
+            )
+    except asyncpg.PostgresError as e:
+        logger.error(f"Ошибка запроса статистики: {e}", exc_info=True)
+        raise
+
+async def record_breach_check(user_id: int, password: str) -> None:
+    """Учёт пароля, найденного в утечках, в статистике пользователя"""
+    try:
+        async with get_connection(user_id=user_id) as conn:
+            await conn.execute(
+                """INSERT INTO password_stats AS s (user_id, day, length, breached)
+                SELECT $1, CURRENT_DATE, $2, 1
+                WHERE EXISTS (SELECT 1 FROM users WHERE user_id = $1)
+                ON CONFLICT (user_id, day, length) DO UPDATE SET
+                    breached = s.breached + 1""",
+                user_id, len(password)
+            )
+    except asyncpg.PostgresError as e:
+        logger.error(f"Ошибка учета утечки: {e}", exc_info=True)
+
 async def add_note(user_id: int, password_id: int, content: str) -> Note:
-    """Создание заметки привязанной к паролю"""
+    """Создание заметки привязанной к паролю пользователя"""
     try:
-        async with get_connection() as conn:
+        async with get_connection(user_id=user_id) as conn:
             record = await conn.fetchrow(
                 """INSERT INTO notes (user_id, password_id, content)
-                VALUES ($1, $2, $3)
+                SELECT $1, id, $3 FROM passwords
+                WHERE user_id = $1 AND id = $2
                 RETURNING id, user_id, password_id, content, created_at""",
                 user_id, password_id, content[:255]
             )
+            if not record:
+                raise ValueError("Пароль не найден")
             return Note(**dict(record))
     except asyncpg.PostgresError as e:
         logger.error(f"Ошибка создания: {e}", exc_info=True)
         raise
 
-async def get_notes(user_id: int, page: int = 1, per_page: int = 8) -> List[Note]:
-    """Получение всех заметок пользователя с пагинацией"""
+def _notes_filter(query: Optional[str], index: int) -> Tuple[str, list]:
+    """Условие поиска по подстроке (ILIKE, использует индекс pg_trgm).
+
+    index — номер параметра запроса для шаблона.
+    """
+    if not query:
+        return "", []
+    pattern = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"AND n.content ILIKE ${index}", [f"%{pattern}%"]
+
+async def get_notes(
+    user_id: int,
+    page: int = 1,
+    per_page: int = 8,
+    query: Optional[str] = None
+) -> List[NoteRow]:
+    """Страница заметок пользователя вместе с паролями одним JOIN-запросом.
+
+    query — поиск по подстроке в тексте заметки.
+    """
+    condition, args = _notes_filter(query, 4)
     try:
-        async with get_connection() as conn:
+        async with get_connection(readonly=True, user_id=user_id) as conn:
             records = await conn.fetch(
-                """SELECT id, user_id, password_id, content, created_at
-                FROM notes
-                WHERE user_id = $1
-                ORDER BY created_at DESC
+                """SELECT n.id, n.user_id, n.password_id, n.content, n.created_at,
+                    p.password, p.password_enc
+                FROM notes n
+                LEFT JOIN passwords p ON p.user_id = n.user_id AND p.id = n.password_id
+                WHERE n.user_id = $1
+                    AND n.id > COALESCE((SELECT note_watermark FROM purge_jobs WHERE user_id = $1), 0)
+                    """ + condition + """
+                ORDER BY n.created_at DESC
                 LIMIT $2 OFFSET $3""",
-                user_id, per_page, (page - 1) * per_page
+                user_id, per_page, (page - 1) * per_page, *args
             )
-            return [Note(**dict(record)) for record in records]
+            passwords = await reveal_page(conn, user_id, records)
+            return [
+                NoteRow(r['id'], r['user_id'], r['password_id'], r['content'], r['created_at'], password)
+                for r, password in zip(records, passwords)
+            ]
     except asyncpg.PostgresError as e:
         logger.error(f"Ошибка выборки: {e}", exc_info=True)
         raise
 
-async def get_note_by_id(note_id: int) -> Optional[Note]:
-    """Получение заметки по ID"""
+async def get_note_count(user_id: int, query: Optional[str] = None) -> int:
+    """Количество заметок пользователя (с учётом поиска)"""
+    condition, args = _notes_filter(query, 2)
     try:
-        async with get_connection() as conn:
-            record = await conn.fetchrow(
-                "SELECT id, user_id, password_id, content, created_at FROM notes WHERE id = $1",
-                note_id
-            )
-            return Note(**dict(record)) if record else None
+        async with get_connection(readonly=True, user_id=user_id) as conn:
+            return cast(int, await conn.fetchval(
+                """SELECT COUNT(*) FROM notes n
+                WHERE n.user_id = $1 AND """ + _VISIBLE_NOTES + " " + condition,
+                user_id, *args
+            ))
+    except asyncpg.PostgresError as e:
+        logger.error(f"Ошибка подсчета: {e}", exc_info=True)
+        raise
+
+async def get_note_by_id(note_id: int, user_id: Optional[int] = None) -> Optional[NoteRow]:
+    """Получение заметки по ID (с user_id — только в партиции владельца)"""
+    query = """SELECT n.id, n.user_id, n.password_id, n.content, n.created_at
+        FROM notes n
+        LEFT JOIN purge_jobs j ON j.user_id = n.user_id
+        WHERE n.id = $1 AND n.id > COALESCE(j.note_watermark, 0)"""
+    args = [note_id]
+    if user_id is not None:
+        query += " AND n.user_id = $2"
+        args.append(user_id)
+    try:
+        async with get_connection(readonly=True, user_id=user_id) as conn:
+            record = await conn.fetchrow(query, *args)
+            return NoteRow(*record) if record else None
     except asyncpg.PostgresError as e:
         logger.error(f"Ошибка поиска: {e}", exc_info=True)
         raise
 
-async def delete_note(note_id: int) -> bool:
+async def delete_note(note_id: int, user_id: Optional[int] = None) -> bool:
     """Удаление заметки"""
     try:
-        async with get_connection() as conn:
-            result = await conn.execute(
-                "DELETE FROM notes WHERE id = $1 RETURNING id",
-                note_id
-            )
+        async with get_connection(user_id=user_id) as conn:
+            if user_id is None:
+                result = await conn.execute("DELETE FROM notes WHERE id = $1", note_id)
+            else:
+                result = await conn.execute(
+                    "DELETE FROM notes WHERE user_id = $2 AND id = $1",
+                    note_id, user_id
+                )
             return "DELETE 1" in result
     except asyncpg.PostgresError as e:
         logger.error(f"Ошибка удаления: {e}", exc_info=True)
         return False
 
-async def delete_password(password_id: int) -> bool:
+async def delete_password(password_id: int, user_id: Optional[int] = None) -> bool:
     try:
-        async with get_connection() as conn:
-            result = await conn.execute(
-                "DELETE FROM passwords WHERE id = $1 RETURNING id",
-                password_id
-            )
+        async with get_connection(user_id=user_id) as conn:
+            if user_id is None:
+                result = await conn.execute("DELETE FROM passwords WHERE id = $1", password_id)
+            else:
+                result = await conn.execute(
+                    "DELETE FROM passwords WHERE user_id = $2 AND id = $1",
+                    password_id, user_id
+                )
             return "DELETE 1" in result
     except asyncpg.PostgresError as e:
         logger.error(f"Ошибка удаления: {e}", exc_info=True)
         return False
 
+async def iter_user_vault(user_id: int, prefetch: int = 500) -> AsyncIterator[tuple]:
+    """Потоковая выборка всех паролей и заметок пользователя, включая архив.
+
+    Отдаёт кортежи (kind, id, password_id, value, created_at) с уже
+    расшифрованными паролями. Использует серверные курсоры, поэтому в памяти
+    одновременно находится не более prefetch строк независимо от размера
+    хранилища; архивные блоки распаковываются по одному.
+    """
+    try:
+        async with get_connection(readonly=True, user_id=user_id) as conn:
+            async with conn.transaction(readonly=True):
+                key = None
+                async for record in conn.cursor(
+                    """SELECT 'password' AS kind, id, NULL::int AS password_id,
+                        password AS value, password_enc, created_at
+                    FROM passwords WHERE user_id = $1 AND """ + _VISIBLE_PASSWORDS + """
+                    UNION ALL
+                    SELECT 'note', id, password_id, content, NULL, created_at
+                    FROM notes WHERE user_id = $1 AND """ + _VISIBLE_NOTES,
+                    user_id,
+                    prefetch=prefetch
+                ):
+                    value = record['value']
+                    if record['password_enc'] is not None:
+                        key = key or await get_data_key(conn, user_id)
+                        value = decrypt(key, user_id, record['password_enc']).decode()
+                    yield (
+                        record['kind'], record['id'], record['password_id'],
+                        value, record['created_at']
+                    )
+
+                async for record in conn.cursor(
+                    """SELECT block, encrypted FROM password_archive
+                    WHERE user_id = $1
+                    ORDER BY last_id DESC""",
+                    user_id,
+                    prefetch=max(1, prefetch // ARCHIVE_BLOCK_SIZE)
+                ):
+                    block = record['block']
+                    if record['encrypted']:
+                        key = key or await get_data_key(conn, user_id)
+                        block = decrypt(key, user_id, block)
+                    for row_id, password, created_at, *notes in _unpack_archive_block(block):
+                        yield ("password", row_id, None, password, datetime.fromisoformat(created_at))
+                        for note_id, content, note_created_at in (notes[0] if notes else ()):
+                            yield ("note", note_id, row_id, content, datetime.fromisoformat(note_created_at))
+    except asyncpg.PostgresError as e:
+        logger.error(f"Ошибка экспорта: {e}", exc_info=True)
+        raise
+
+def _seal_import_row(key, user_id: int, row: tuple) -> tuple:
+    """Дополняет строку импорта шифртекстом и длиной пароля"""
+    kind, value = row[0], row[3]
+    if kind != "password":
+        return (*row, None, None)
+    if key is None:
+        return (*row, None, len(value))
+    return (*row[:3], None, *row[4:], encrypt(key, user_id, value.encode()), len(value))
+
+async def import_vault(
+    user_id: int,
+    batches: AsyncIterator[List[tuple]]
+) -> Tuple[int, int]:
+    """Массовый импорт паролей и заметок через COPY.
+
+    batches отдаёт пачки строк (kind, source_id, password_id, value,
+    created_at, digest, score, entropy). Строки загружаются во временную таблицу, затем одним
+    запросом переносятся в passwords/notes: заметки привязываются к
+    новым ID паролей по source_id. В passwords попадают только последние
+    MAX_PASSWORDS_PER_USER импортированных паролей, более старые вместе с
+    заметками сразу складываются в архив; лишние текущие пароли уходят туда же.
+    При включённом шифровании пароли шифруются до COPY.
+    Возвращает количество импортированных паролей и заметок.
+    """
+    try:
+        async with get_connection(user_id=user_id) as conn:
+            async with conn.transaction():
+                await conn.execute("""
+                    CREATE TEMP TABLE import_staging (
+                        kind TEXT NOT NULL,
+                        source_id INT,
+                        password_id INT,
+                        value TEXT,
+                        created_at TIMESTAMP NOT NULL,
+                        digest BYTEA,
+                        score REAL,
+                        entropy REAL,
+                        value_enc BYTEA,
+                        length SMALLINT,
+                        new_id INT
+                    ) ON COMMIT DROP
+                """)
+                key = await get_data_key(conn, user_id, create=True)
+                async for batch in batches:
+                    await conn.copy_records_to_table(
+                        "import_staging",
+                        records=[_seal_import_row(key, user_id, row) for row in batch],
+                        columns=[
+                            "kind", "source_id", "password_id", "value",
+                            "created_at", "digest", "score", "entropy",
+                            "value_enc", "length"
+                        ]
+                    )
+
+                # ID выдаются в хронологическом порядке, чтобы обрезка по id
+                # удаляла действительно самые старые пароли
+                await conn.execute("""
+                    UPDATE import_staging s
+                    SET new_id = o.id
+                    FROM (
+                        SELECT row_ctid, nextval(pg_get_serial_sequence('passwords', 'id')) AS id
+                        FROM (
+                            SELECT ctid AS row_ctid FROM import_staging
+                            WHERE kind = 'password'
+                            ORDER BY created_at, source_id
+                        ) ordered
+                    ) o
+                    WHERE s.ctid = o.row_ctid
+                """)
+
+                record = await conn.fetchrow("""
+                    WITH imported AS (
+                        SELECT new_id, source_id, value, value_enc, length, created_at,
+                            digest, score, entropy
+                        FROM import_staging
+                        WHERE kind = 'password'
+                        ORDER BY new_id DESC
+                        LIMIT $2
+                    ), inserted_passwords AS (
+                        INSERT INTO passwords (
+                            id, user_id, password, password_enc, length,
+                            created_at, digest, score, entropy
+                        )
+                        SELECT new_id, $1, value, value_enc, length,
+                            created_at, digest, score, entropy
+                        FROM imported
+                        RETURNING id
+                    ), inserted_notes AS (
+                        INSERT INTO notes (user_id, password_id, content, created_at)
+                        SELECT $1, p.new_id, n.value, n.created_at
+                        FROM import_staging n
+                        JOIN imported p ON p.source_id = n.password_id
+                        WHERE n.kind = 'note'
+                        RETURNING id
+                    )
+                    SELECT
+                        (SELECT COUNT(*) FROM inserted_passwords) AS passwords,
+                        (SELECT COUNT(*) FROM inserted_notes) AS notes
+                """, user_id, MAX_PASSWORDS_PER_USER)
+
+                # ID импорта новее всех текущих паролей, поэтому пароли старше
+                # последних MAX_PASSWORDS_PER_USER в списке не остались бы: их
+                # блоки собираются прямо из import_staging, без вставки в passwords
+                # и последующего удаления
+                archived = archived_notes = 0
+                blocks, chunk = [], []
+                async for row in conn.cursor("""
+                    SELECT s.new_id AS id, s.value AS password, s.value_enc AS password_enc,
+                        s.created_at, n.notes
+                    FROM (
+                        SELECT new_id, source_id, value, value_enc, created_at,
+                            row_number() OVER (ORDER BY new_id DESC) AS rank
+                        FROM import_staging
+                        WHERE kind = 'password'
+                    ) s
+                    LEFT JOIN (
+                        SELECT password_id, array_agg((
+                            nextval(pg_get_serial_sequence('notes', 'id')), value, created_at
+                        )) AS notes
+                        FROM import_staging
+                        WHERE kind = 'note'
+                        GROUP BY password_id
+                    ) n ON n.password_id = s.source_id
+                    WHERE s.rank > $1
+                    ORDER BY s.new_id
+                """, MAX_PASSWORDS_PER_USER, prefetch=ARCHIVE_BLOCK_SIZE * 20):
+                    chunk.append(row)
+                    archived += 1
+                    archived_notes += len(row['notes'] or ())
+                    if len(chunk) == ARCHIVE_BLOCK_SIZE:
+                        blocks.append(_archive_block(key, user_id, chunk))
+                        chunk = []
+                if chunk:
+                    blocks.append(_archive_block(key, user_id, chunk))
+                if blocks:
+                    await _insert_archive_blocks(conn, blocks)
+
+                await _archive_overflow(conn, user_id, MAX_PASSWORDS_PER_USER)
+                return record['passwords'] + archived, record['notes'] + archived_notes
+    except asyncpg.PostgresError as e:
+        logger.error(f"Ошибка импорта: {e}", exc_info=True)
+        raise
+
 async def export_note(note_id: int) -> str:
     """Экспорт заметки в файл"""
     filename = None
@@ -185,23 +686,198 @@ async def export_note(note_id: int) -> str:
                 logger.error(f"Ошибка очистки: {e}", exc_info=True)
 
 async def clear_all_data(user_id: int) -> None:
-    """Полная очистка данных пользователя"""
+    """Полная очистка данных пользователя.
+
+    Только помечает данные к удалению: текущие пароли и заметки сразу
+    скрываются на чтении, а удаляет их фоновый воркер (purge.py) пачками.
+    Компактный архив паролей и статистика удаляются сразу.
+    """
     try:
-        async with get_connection() as conn:
+        async with get_connection(user_id=user_id) as conn:
             async with conn.transaction():
-                await conn.execute("DELETE FROM passwords WHERE user_id = $1", user_id)
-                await conn.execute("DELETE FROM notes WHERE user_id = $1", user_id)
-                logger.info(f"Данные пользователя {user_id} очищены")
+                await conn.execute("""
+                    INSERT INTO purge_jobs (user_id, password_watermark, note_watermark)
+                    VALUES (
+                        $1,
+                        COALESCE((SELECT MAX(id) FROM passwords WHERE user_id = $1), 0),
+                        COALESCE((SELECT MAX(id) FROM notes WHERE user_id = $1), 0)
+                    )
+                    ON CONFLICT (user_id) DO UPDATE SET
+                        password_watermark = EXCLUDED.password_watermark,
+                        note_watermark = EXCLUDED.note_watermark,
+                        requested_at = NOW(),
+                        finished_at = NULL
+                """, user_id)
+                await conn.execute("DELETE FROM password_archive WHERE user_id = $1", user_id)
+                await conn.execute("DELETE FROM password_stats WHERE user_id = $1", user_id)
+            _known_users.pop(user_id)
+            logger.info(f"Данные пользователя {user_id} помечены к очистке")
     except asyncpg.PostgresError as e:
         logger.error(f"Ошибка очистки: {e}", exc_info=True)
         raise
 
+async def purge_batch(batch_size: int) -> Optional[Tuple[int, int, bool]]:
+    """Удаляет одну пачку строк самой старой незавершённой очистки.
+
+    Каждая пачка — отдельная транзакция с прогрессом в purge_jobs, поэтому
+    после падения работа продолжается с того же места. SKIP LOCKED позволяет
+    нескольким воркерам не мешать друг другу. Возвращает (user_id, удалено,
+    завершено) или None, если очищать нечего.
+    """
+    try:
+        async with get_connection() as conn:
+            async with conn.transaction():
+                job = await conn.fetchrow("""
+                    SELECT user_id, password_watermark, note_watermark
+                    FROM purge_jobs
+                    WHERE finished_at IS NULL
+                    ORDER BY requested_at
+                    LIMIT 1
+                    FOR UPDATE SKIP LOCKED
+                """)
+                if not job:
+                    return None
+                user_id = job['user_id']
+
+                notes = await conn.fetchval("""
+                    WITH batch AS (
+                        DELETE FROM notes
+                        WHERE user_id = $1 AND id IN (
+                            SELECT id FROM notes
+                            WHERE user_id = $1 AND id <= $2
+                            LIMIT $3
+                        )
+                        RETURNING 1
+                    )
+                    SELECT COUNT(*) FROM batch
+                """, user_id, job['note_watermark'], batch_size)
+
+                passwords = 0
+                if notes < batch_size:
+                    passwords = await conn.fetchval("""
+                        WITH batch AS (
+                            DELETE FROM passwords
+                            WHERE user_id = $1 AND id IN (
+                                SELECT id FROM passwords
+                                WHERE user_id = $1 AND id <= $2
+                                LIMIT $3
+                            )
+                            RETURNING 1
+                        )
+                        SELECT COUNT(*) FROM batch
+                    """, user_id, job['password_watermark'], batch_size - notes)
+
+                done = notes + passwords < batch_size
+                await conn.execute("""
+                    UPDATE purge_jobs SET
+                        deleted_notes = deleted_notes + $2,
+                        deleted_passwords = deleted_passwords + $3,
+                        finished_at = CASE WHEN $4 THEN NOW() END
+                    WHERE user_id = $1
+                """, user_id, notes, passwords, done)
+                return user_id, notes + passwords, done
+    except asyncpg.PostgresError as e:
+        logger.error(f"Ошибка пакетной очистки: {e}", exc_info=True)
+        raise
+
+async def backfill_password_digests(batch_size: int) -> int:
+    """Заполняет digest у одной пачки старых строк. Возвращает число строк."""
+    try:
+        async with get_connection() as conn:
+            async with conn.transaction():
+                records = await conn.fetch(
+                    """SELECT user_id, id, password FROM passwords
+                    WHERE digest IS NULL AND password IS NOT NULL
+                    LIMIT $1
+                    FOR UPDATE SKIP LOCKED""",
+                    batch_size
+                )
+                await conn.executemany(
+                    "UPDATE passwords SET digest = $3 WHERE user_id = $1 AND id = $2",
+                    [(r['user_id'], r['id'], password_digest(r['password'])) for r in records]
+                )
+                return len(records)
+    except asyncpg.PostgresError as e:
+        logger.error(f"Ошибка заполнения digest: {e}", exc_info=True)
+        raise
+
+async def backfill_password_scores(batch_size: int) -> int:
+    """Заполняет score/entropy у одной пачки старых строк. Возвращает число строк."""
+    try:
+        async with get_connection() as conn:
+            async with conn.transaction():
+                records = await conn.fetch(
+                    """SELECT user_id, id, password FROM passwords
+                    WHERE score IS NULL AND password IS NOT NULL
+                    LIMIT $1
+                    FOR UPDATE SKIP LOCKED""",
+                    batch_size
+                )
+                await conn.executemany(
+                    "UPDATE passwords SET score = $3, entropy = $4 WHERE user_id = $1 AND id = $2",
+                    [(r['user_id'], r['id'], *password_strength(r['password'])) for r in records]
+                )
+                return len(records)
+    except asyncpg.PostgresError as e:
+        logger.error(f"Ошибка заполнения оценок: {e}", exc_info=True)
+        raise
+
+async def encrypt_plaintext_passwords(batch_size: int) -> int:
+    """Шифрует одну пачку открытых паролей ключами данных владельцев.
+
+    Возвращает число строк; без PASSWORD_MASTER_KEY ничего не делает.
+    """
+    # Без ключа строки не блокируются: иначе каждая пачка держала бы
+    # FOR UPDATE на паролях, которые всё равно останутся открытыми
+    if not encryption_enabled():
+        return 0
+    try:
+        async with get_connection() as conn:
+            async with conn.transaction():
+                records = await conn.fetch(
+                    """SELECT user_id, id, password FROM passwords
+                    WHERE password IS NOT NULL
+                    LIMIT $1
+                    FOR UPDATE SKIP LOCKED""",
+                    batch_size
+                )
+                updates = []
+                for r in records:
+                    key = await get_data_key(conn, r['user_id'], create=True)
+                    updates.append((
+                        r['user_id'], r['id'],
+                        encrypt(key, r['user_id'], r['password'].encode())
+                    ))
+                await conn.executemany(
+                    """UPDATE passwords SET password = NULL, password_enc = $3
+                    WHERE user_id = $1 AND id = $2""",
+                    updates
+                )
+                return len(records)
+    except asyncpg.PostgresError as e:
+        logger.error(f"Ошибка шифрования паролей: {e}", exc_info=True)
+        raise
+
+async def get_purge_progress(user_id: int) -> Optional[asyncpg.Record]:
+    """Прогресс очистки данных пользователя"""
+    try:
+        async with get_connection(readonly=True, user_id=user_id) as conn:
+            return await conn.fetchrow(
+                """SELECT deleted_passwords, deleted_notes, requested_at, finished_at
+                FROM purge_jobs WHERE user_id = $1""",
+                user_id
+            )
+    except asyncpg.PostgresError as e:
+        logger.error(f"Ошибка запроса: {e}", exc_info=True)
+        raise
+
 async def get_last_password_id(user_id: int) -> Optional[int]:
     """Получение ID последнего пароля пользователя"""
     try:
         async with get_connection() as conn:
             record = await conn.fetchrow(
-                "SELECT id FROM passwords WHERE user_id = $1 ORDER BY id DESC LIMIT 1",
+                "SELECT id FROM passwords WHERE user_id = $1 AND " + _VISIBLE_PASSWORDS
+                + " ORDER BY id DESC LIMIT 1",
                 user_id
             )
             return record['id'] if record else None
@@ -1,14 +1,38 @@
 from __future__ import annotations
+import asyncio
+import itertools
+import os
+import sys
+import time
 import asyncpg
-from config import DATABASE_URL
+from config import (
+    DATABASE_URL,
+    PG_POOL_MIN_SIZE,
+    PG_POOL_MAX_SIZE,
+    PG_COMMAND_TIMEOUT,
+    SLOW_QUERY_MS,
+    PG_REPLICA_URLS,
+    PG_HASH_PARTITIONS,
+    READ_YOUR_WRITES_SECONDS,
+    REPLICA_ACQUIRE_TIMEOUT,
+    REPLICA_RETRY_SECONDS,
+    USER_CACHE_SIZE
+)
+from cache import TTLCache
 import logging
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator
+from typing import AsyncContextManager, AsyncGenerator, Dict, List, Tuple
 
 logger = logging.getLogger(__name__)
 
 from typing import Optional
 _pool: Optional[asyncpg.Pool] = None
+_replica_pools: List[asyncpg.Pool] = []
+_replica_down_until: Dict[int, float] = {}
+_replica_cursor = itertools.count()
+
+# Пользователи, недавно писавшие в БД: их чтения идут на primary
+_recent_writers = TTLCache(maxsize=USER_CACHE_SIZE, ttl=READ_YOUR_WRITES_SECONDS)
 
 
 async def create_pool() -> None:
@@ -18,79 +42,326 @@ async def create_pool() -> None:
         try:
             _pool = await asyncpg.create_pool(
                 dsn=DATABASE_URL,
-                min_size=5,
-                max_size=20,
-                command_timeout=60
+                min_size=PG_POOL_MIN_SIZE,
+                max_size=PG_POOL_MAX_SIZE,
+                command_timeout=PG_COMMAND_TIMEOUT
             )
             logger.info("✅ Пул соединений PostgreSQL инициализирован")
         except Exception as e:
             logger.critical(f"❌ Ошибка создания пула: {e}", exc_info=True)
             raise
 
+        for dsn in PG_REPLICA_URLS:
+            # min_size=0: недоступная при старте реплика не мешает запуску,
+            # соединения откроются при первом обращении
+            _replica_pools.append(await asyncpg.create_pool(
+                dsn=dsn,
+                min_size=0,
+                max_size=PG_POOL_MAX_SIZE,
+                command_timeout=PG_COMMAND_TIMEOUT
+            ))
+        if _replica_pools:
+            logger.info(f"✅ Пулы реплик инициализированы: {len(_replica_pools)}")
+
+
+async def close_pools() -> None:
+    """Закрытие пулов primary и реплик."""
+    global _pool
+    for replica in _replica_pools:
+        await replica.close()
+    _replica_pools.clear()
+    if _pool:
+        await _pool.close()
+        _pool = None
+
+
+def mark_write(user_id: int) -> None:
+    """Открывает окно read-your-writes: чтения пользователя идут на primary."""
+    _recent_writers.set(user_id, True)
+
+
+def _pick_replica() -> Optional[Tuple[int, asyncpg.Pool]]:
+    now = time.monotonic()
+    count = len(_replica_pools)
+    for _ in range(count):
+        index = next(_replica_cursor) % count
+        if _replica_down_until.get(index, 0) <= now:
+            return index, _replica_pools[index]
+    return None
+
+
+class PoolStats:
+    """Счётчики использования пула: ожидание acquire, удержание, занятость."""
+
+    def __init__(self):
+        self.acquires = 0
+        self.acquire_total = 0.0
+        self.acquire_max = 0.0
+        self.hold_total = 0.0
+        self.hold_max = 0.0
+        self.in_use = 0
+        self.in_use_max = 0
+        self.slow = 0
+
+    def snapshot(self) -> Dict[str, float]:
+        acquires = self.acquires or 1
+        return {
+            "acquires": self.acquires,
+            "acquire_avg_ms": self.acquire_total / acquires * 1000,
+            "acquire_max_ms": self.acquire_max * 1000,
+            "hold_avg_ms": self.hold_total / acquires * 1000,
+            "hold_max_ms": self.hold_max * 1000,
+            "in_use": self.in_use,
+            "in_use_max": self.in_use_max,
+            "pool_size": _pool.get_size() if _pool else 0,
+            "slow": self.slow,
+        }
+
+
+pool_stats = PoolStats()
+
+
+def get_connection(
+    readonly: bool = False,
+    user_id: Optional[int] = None
+) -> AsyncContextManager[asyncpg.Connection]:
+    """Контекстный менеджер для безопасного использования соединений.
+
+    readonly=True разрешает чтение с реплики, если пользователь user_id
+    не писал в БД в течение окна read-your-writes. Запись с указанным
+    user_id открывает это окно. Запоминает вызывающую функцию, чтобы
+    медленные запросы логировались с её именем.
+    """
+    if not readonly and user_id is not None:
+        mark_write(user_id)
+    use_replica = readonly and bool(_replica_pools) and (
+        user_id is None or user_id not in _recent_writers
+    )
+    return _instrumented_connection(sys._getframe(1).f_code.co_name, use_replica)
+
+
+async def _acquire(use_replica: bool) -> Tuple[asyncpg.Connection, asyncpg.Pool]:
+    picked = _pick_replica() if use_replica else None
+    if picked:
+        index, replica = picked
+        try:
+            return await replica.acquire(timeout=REPLICA_ACQUIRE_TIMEOUT), replica
+        except (OSError, asyncio.TimeoutError, asyncpg.PostgresError) as e:
+            _replica_down_until[index] = time.monotonic() + REPLICA_RETRY_SECONDS
+            logger.warning(f"⚠️ Реплика {index} недоступна, чтение с primary: {e}")
+    return await _pool.acquire(), _pool
+
 
 @asynccontextmanager
-async def get_connection() -> AsyncGenerator[asyncpg.Connection, None]:
-    """Контекстный менеджер для безопасного использования соединений."""
+async def _instrumented_connection(
+    caller: str,
+    use_replica: bool = False
+) -> AsyncGenerator[asyncpg.Connection, None]:
     global _pool
 
     if _pool is None:
         await create_pool()
 
-    conn = await _pool.acquire()
+    started = time.perf_counter()
+    conn, pool = await _acquire(use_replica)
+    acquired = time.perf_counter()
+
+    wait = acquired - started
+    pool_stats.acquires += 1
+    pool_stats.acquire_total += wait
+    pool_stats.acquire_max = max(pool_stats.acquire_max, wait)
+    pool_stats.in_use += 1
+    pool_stats.in_use_max = max(pool_stats.in_use_max, pool_stats.in_use)
     try:
         yield conn
     finally:
-        await _pool.release(conn)
+        await pool.release(conn)
+        pool_stats.in_use -= 1
+        held = time.perf_counter() - acquired
+        pool_stats.hold_total += held
+        pool_stats.hold_max = max(pool_stats.hold_max, held)
+        if (wait + held) * 1000 >= SLOW_QUERY_MS:
+            pool_stats.slow += 1
+            logger.warning(
+                f"🐢 Медленный запрос в {caller}: ожидание {wait * 1000:.1f} мс, "
+                f"выполнение {held * 1000:.1f} мс, занято {pool_stats.in_use + 1}"
+                f"/{pool.get_size()}"
+            )
+
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "migrations")
+MIGRATIONS_LOCK_ID = 0x7A70617373  # произвольный ключ advisory lock ("zpass")
+
+
+def load_migrations() -> List[Tuple[int, str, str]]:
+    """Список миграций (версия, имя, SQL), отсортированный по версии.
+
+    Имя файла должно начинаться с номера версии: 0001_initial.sql.
+    """
+    migrations = []
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        if not filename.endswith(".sql"):
+            continue
+        version = int(filename.split("_", 1)[0])
+        with open(os.path.join(MIGRATIONS_DIR, filename), encoding="utf-8") as f:
+            migrations.append((version, filename, f.read()))
+    return sorted(migrations)
+
+
+async def _current_version(conn: asyncpg.Connection) -> int:
+    return await conn.fetchval(
+        "SELECT COALESCE(MAX(version), 0) FROM schema_version"
+    )
 
 
 async def init_db() -> None:
-    """Инициализация структуры БД с транзакцией."""
+    """Применение недостающих миграций схемы БД.
+
+    Уже применённые версии пропускаются, данные сохраняются. Миграции
+    выполняются в одной транзакции под advisory lock, поэтому несколько
+    одновременно стартующих реплик не мешают друг другу.
+    """
+    migrations = load_migrations()
+    latest = migrations[-1][0] if migrations else 0
+
     async with get_connection() as conn:
         try:
-            async with conn.transaction():
-                await conn.execute("""
-                    DROP TABLE IF EXISTS 
-                        notes, 
-                        passwords, 
-                        users CASCADE
-                """)
-
-                await conn.execute("""
-                    CREATE TABLE users (
-                        user_id BIGINT PRIMARY KEY,
-                        username VARCHAR(32)
-                    )
-                """)
-
-                await conn.execute("""
-                    CREATE TABLE passwords (
-                        id SERIAL PRIMARY KEY,
-                        user_id BIGINT REFERENCES users(user_id) 
-                            ON DELETE CASCADE,
-                        password VARCHAR(15) NOT NULL,
-                        created_at TIMESTAMP DEFAULT NOW()
-                    )
-                """)
-
-                await conn.execute("""
-                    CREATE TABLE notes (
-                        id SERIAL PRIMARY KEY,
-                        user_id BIGINT REFERENCES users(user_id) 
-                            ON DELETE CASCADE,
-                        password_id INT REFERENCES passwords(id) 
-                            ON DELETE CASCADE,
-                        content VARCHAR(255) NOT NULL,
-                        created_at TIMESTAMP DEFAULT NOW()
+            has_versions = await conn.fetchval(
+                "SELECT to_regclass('schema_version') IS NOT NULL"
+            )
+            # На актуальной схеме пропускаются только миграции: перевод на
+            # партиции ниже выполняется и для уже развёрнутой БД
+            if has_versions and await _current_version(conn) >= latest:
+                logger.info(f"🚀 Схема БД актуальна (версия {latest})")
+            else:
+                async with conn.transaction():
+                    await conn.execute(
+                        "SELECT pg_advisory_xact_lock($1)", MIGRATIONS_LOCK_ID
                     )
-                """)
+                    await conn.execute("""
+                        CREATE TABLE IF NOT EXISTS schema_version (
+                            version INT PRIMARY KEY,
+                            name TEXT NOT NULL,
+                            applied_at TIMESTAMP DEFAULT NOW()
+                        )
+                    """)
+                    current = await _current_version(conn)
+                    for version, name, sql in migrations:
+                        if version <= current:
+                            continue
+                        await conn.execute(sql)
+                        await conn.execute(
+                            "INSERT INTO schema_version (version, name) VALUES ($1, $2)",
+                            version, name
+                        )
+                        logger.info(f"📦 Применена миграция {name}")
 
-                await conn.execute("""
-                    CREATE INDEX idx_passwords_user 
-                    ON passwords(user_id, created_at DESC)
-                """)
-
-                logger.info("🚀 База данных инициализирована")
+                logger.info(f"🚀 База данных обновлена до версии {latest}")
 
         except asyncpg.PostgresError as e:
             logger.error(f"🔥 Ошибка SQL: {e}", exc_info=True)
             raise
+
+    if PG_HASH_PARTITIONS > 0:
+        await partition_tables(PG_HASH_PARTITIONS)
+
+
+_PARTITION_FOREIGN_KEYS = [
+    ("passwords", [
+        "FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE",
+    ]),
+    ("notes", [
+        "FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE",
+        "FOREIGN KEY (user_id, password_id) REFERENCES passwords(user_id, id) ON DELETE CASCADE",
+    ]),
+]
+
+
+async def _is_partitioned(conn: asyncpg.Connection, table: str) -> bool:
+    return await conn.fetchval(
+        "SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass($1)", table
+    )
+
+
+async def _convert_to_hash_partitions(
+    conn: asyncpg.Connection,
+    table: str,
+    partitions: int,
+    foreign_keys: List[str]
+) -> None:
+    """Пересоздаёт таблицу как PARTITION BY HASH (user_id) с переносом данных.
+
+    Колонки, значения по умолчанию, вторичные индексы и триггеры берутся из исходной
+    таблицы, поэтому преобразование не зависит от того, какие миграции уже
+    добавили колонки. Индексы на партиционированной таблице создаются
+    во всех партициях.
+    """
+    old = f"{table}_unpartitioned"
+    index_defs = await conn.fetch("""
+        SELECT indexname, indexdef FROM pg_indexes
+        WHERE schemaname = current_schema() AND tablename = $1
+            AND indexname <> $1 || '_pkey'
+    """, table)
+    trigger_defs = await conn.fetch("""
+        SELECT pg_get_triggerdef(oid) AS triggerdef FROM pg_trigger
+        WHERE tgrelid = to_regclass($1) AND NOT tgisinternal
+    """, table)
+    sequence = await conn.fetchval("SELECT pg_get_serial_sequence($1, 'id')", table)
+
+    await conn.execute(f"ALTER TABLE {table} RENAME TO {old}")
+    await conn.execute(
+        f"ALTER TABLE {old} RENAME CONSTRAINT {table}_pkey TO {old}_pkey"
+    )
+    if sequence:
+        await conn.execute(f"ALTER SEQUENCE {sequence} OWNED BY NONE")
+
+    await conn.execute(f"""
+        CREATE TABLE {table} (
+            LIKE {old} INCLUDING DEFAULTS,
+            PRIMARY KEY (user_id, id)
+        ) PARTITION BY HASH (user_id)
+    """)
+    for remainder in range(partitions):
+        await conn.execute(f"""
+            CREATE TABLE {table}_p{remainder} PARTITION OF {table}
+            FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})
+        """)
+
+    await conn.execute(
+        f"INSERT INTO {table} SELECT * FROM {old} WHERE user_id IS NOT NULL"
+    )
+    await conn.execute(f"DROP TABLE {old} CASCADE")
+
+    # Определения сняты до переименования и уже ссылаются на новое имя таблицы
+    for record in index_defs:
+        await conn.execute(record['indexdef'])
+    for record in trigger_defs:
+        await conn.execute(record['triggerdef'])
+    for foreign_key in foreign_keys:
+        await conn.execute(f"ALTER TABLE {table} ADD {foreign_key}")
+    if sequence:
+        await conn.execute(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id")
+
+
+async def partition_tables(partitions: int) -> None:
+    """Опциональный перевод passwords и notes на hash-партиционирование.
+
+    Идемпотентно: уже партиционированные таблицы пропускаются. Выполняется
+    в одной транзакции под тем же advisory lock, что и миграции.
+    """
+    async with get_connection() as conn:
+        if await _is_partitioned(conn, "passwords") and await _is_partitioned(conn, "notes"):
+            return
+        try:
+            async with conn.transaction():
+                await conn.execute(
+                    "SELECT pg_advisory_xact_lock($1)", MIGRATIONS_LOCK_ID
+                )
+                # passwords раньше notes: FK notes ссылается на новый PK passwords
+                for table, foreign_keys in _PARTITION_FOREIGN_KEYS:
+                    if not await _is_partitioned(conn, table):
+                        await _convert_to_hash_partitions(conn, table, partitions, foreign_keys)
+            logger.info(f"🧩 passwords/notes разбиты на {partitions} hash-партиций")
+        except asyncpg.PostgresError as e:
+            logger.error(f"🔥 Ошибка партиционирования: {e}", exc_info=True)
+            raise
@@ -1,41 +1,65 @@
 import inspect
 import logging
-from typing import cast, Optional
+from array import array
+from typing import Iterable, Optional, cast
 from aiogram import Bot
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 
+from outbound import delete_later
+
 logger = logging.getLogger(__name__)
 
+# Сколько последних сообщений бота помнить для уборки
+MAX_TRACKED_MESSAGES = 32
+
+# Нажатия, после которых сообщение с кнопкой не удаляется: обработчик
+# редактирует его (length_, main_menu, regenerate_) или удаляет сам
+# (check_custom, check_hibp). Удаление идёт в фоне и дошло бы до Telegram
+# уже после редактирования
+KEEP_MESSAGE_PREFIXES = ("length_", "main_menu", "regenerate_", "check_custom", "check_hibp")
+
+
 class MessageManager:
-    def __init__(self):
-        self.message_stack = []
-        self.last_user_message: Optional[int] = None
+    """ID сообщений для уборки: компактный массив, не больше MAX_TRACKED_MESSAGES.
+
+    Хранится в данных FSM каждого пользователя, поэтому без __dict__ и без
+    списка int-объектов.
+    """
+    __slots__ = ("message_stack", "last_user_message")
+
+    def __init__(self, message_ids: Iterable[int] = (), last_user_message: Optional[int] = None):
+        self.message_stack = array("q", message_ids)
+        del self.message_stack[:-MAX_TRACKED_MESSAGES]
+        self.last_user_message = last_user_message
 
     async def cleanup(self, bot: Bot, chat_id: int):
+        message_ids = self.message_stack.tolist()
         if self.last_user_message:
+            message_ids.append(self.last_user_message)
+        # Одним deleteMessages; уже удалённые сообщения Telegram пропускает
+        if message_ids:
             try:
-                await bot.delete_message(chat_id, self.last_user_message)
+                await bot.delete_messages(chat_id, message_ids)
             except Exception as e:
-                logger.error(f"Ошибка удаления сообщения: {e}")
-
-        for msg_id in self.message_stack:
-            try:
-                await bot.delete_message(chat_id, msg_id)
-            except Exception as e:
-                if "message to delete not found" not in str(e):
-                    logger.error(f"Ошибка удаления: {e}")
-        self.message_stack.clear()
+                logger.error(f"Ошибка удаления: {e}")
+        del self.message_stack[:]
         self.last_user_message = None
 
     def track(self, message: Message):
         self.message_stack.append(message.message_id)
+        if len(self.message_stack) > MAX_TRACKED_MESSAGES:
+            del self.message_stack[0]
 
 def message_cleaner(func):
+    # Сигнатура разбирается один раз при декорировании, а не на каждый вызов
+    parameters = inspect.signature(func).parameters
+    accepted = frozenset(parameters)
+    accepts_any = any(p.kind is inspect.Parameter.VAR_KEYWORD for p in parameters.values())
+
     async def wrapper(*args, **kwargs):
-        filtered_kwargs = {
-            k: v for k, v in kwargs.items()
-            if k in inspect.signature(func).parameters
+        filtered_kwargs = kwargs if accepts_any else {
+            k: v for k, v in kwargs.items() if k in accepted
         }
 
         state = None
@@ -59,12 +83,11 @@ def message_cleaner(func):
                 message = arg
                 break
 
-        if message and callback and not callback.data.startswith(("copy_", "length_", "check_password_", "main_menu", "check_custom", "check_hibp")):
-            try:
-                await message.delete()
-                manager.last_user_message = cast(int, message.message_id)
-            except Exception as e:
-                logger.error(f"Ошибка удаления: {e}")
+        if message and callback and not callback.data.startswith(KEEP_MESSAGE_PREFIXES):
+            # Удаление уходит в фон: ответ обработчика отправляется первым,
+            # а удаления одного чата склеиваются в deleteMessages
+            delete_later(message)
+            manager.last_user_message = cast(int, message.message_id)
 
         result = await func(*args, **filtered_kwargs)
 
@@ -74,4 +97,9 @@ def message_cleaner(func):
                 await state.update_data(manager=manager)
 
         return result
+
+    # Имя для логов и проверки маршрутов; __wrapped__ не ставится, чтобы
+    # aiogram передавал wrapper все аргументы, включая state
+    wrapper.__module__ = func.__module__
+    wrapper.__qualname__ = func.__qualname__
     return wrapper
\ No newline at end of file
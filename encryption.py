@@ -0,0 +1,111 @@
+import base64
+import logging
+import os
+from typing import Any, Iterable, List, Optional
+
+import asyncpg
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from cache import TTLCache
+from config import PASSWORD_MASTER_KEY, DATA_KEY_CACHE_SIZE, USER_CACHE_TTL, ConfigError
+
+logger = logging.getLogger(__name__)
+
+NONCE_SIZE = 12
+
+try:
+    _master: Optional[AESGCM] = (
+        AESGCM(base64.b64decode(PASSWORD_MASTER_KEY)) if PASSWORD_MASTER_KEY else None
+    )
+except ValueError as e:
+    raise ConfigError(f"Некорректный PASSWORD_MASTER_KEY: {e}") from e
+
+if _master is None:
+    logger.warning("⚠️ PASSWORD_MASTER_KEY не задан: пароли хранятся без шифрования")
+
+# user_id -> AESGCM с расшифрованным ключом данных
+_data_keys = TTLCache(maxsize=DATA_KEY_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+
+def encryption_enabled() -> bool:
+    return _master is not None
+
+
+def _aad(user_id: int) -> bytes:
+    # Шифртекст привязан к владельцу: чужую строку подставить нельзя
+    return str(user_id).encode()
+
+
+def encrypt(key: AESGCM, user_id: int, plaintext: bytes) -> bytes:
+    nonce = os.urandom(NONCE_SIZE)
+    return nonce + key.encrypt(nonce, plaintext, _aad(user_id))
+
+
+def decrypt(key: AESGCM, user_id: int, blob: bytes) -> bytes:
+    return key.decrypt(blob[:NONCE_SIZE], blob[NONCE_SIZE:], _aad(user_id))
+
+
+async def get_data_key(
+    conn: asyncpg.Connection,
+    user_id: int,
+    create: bool = False
+) -> Optional[AESGCM]:
+    """Ключ данных пользователя из LRU-кэша или user_keys.
+
+    create=True создаёт ключ при первом шифровании. Параллельное создание
+    безопасно: побеждает первая запись, остальные читают её.
+    """
+    key = _data_keys.get(user_id)
+    if key is not None:
+        return key
+    if _master is None:
+        if create:
+            return None
+        raise ConfigError("PASSWORD_MASTER_KEY не задан, а данные зашифрованы")
+
+    wrapped = await conn.fetchval(
+        "SELECT wrapped_key FROM user_keys WHERE user_id = $1", user_id
+    )
+    if wrapped is None:
+        if not create:
+            return None
+        await conn.execute(
+            """INSERT INTO user_keys (user_id, wrapped_key) VALUES ($1, $2)
+            ON CONFLICT (user_id) DO NOTHING""",
+            user_id, encrypt(_master, user_id, AESGCM.generate_key(bit_length=256))
+        )
+        wrapped = await conn.fetchval(
+            "SELECT wrapped_key FROM user_keys WHERE user_id = $1", user_id
+        )
+
+    key = AESGCM(decrypt(_master, user_id, wrapped))
+    _data_keys.set(user_id, key)
+    return key
+
+
+def reveal_rows(
+    key: Optional[AESGCM],
+    user_id: int,
+    rows: Iterable[Any],
+    plain: str = "password",
+    enc: str = "password_enc"
+) -> List[Optional[str]]:
+    """Открытые тексты паролей для набора строк (зашифрованных или нет)"""
+    return [
+        row[plain] if row[enc] is None else decrypt(key, user_id, row[enc]).decode()
+        for row in rows
+    ]
+
+
+async def reveal_page(
+    conn: asyncpg.Connection,
+    user_id: int,
+    rows: List[Any],
+    plain: str = "password",
+    enc: str = "password_enc"
+) -> List[Optional[str]]:
+    """Расшифровка страницы: ключ данных запрашивается один раз на страницу"""
+    key = None
+    if any(row[enc] is not None for row in rows):
+        key = await get_data_key(conn, user_id)
+    return reveal_rows(key, user_id, rows, plain, enc)
@@ -0,0 +1,77 @@
+import csv
+import gzip
+import io
+import json
+import logging
+import tempfile
+from typing import IO, AsyncGenerator
+
+from aiogram import Bot
+from aiogram.types import InputFile
+
+from crud import iter_user_vault
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("csv", "json")
+SPOOL_MAX_SIZE = 1024 * 1024
+EXPORT_FIELDS = ("kind", "id", "password_id", "value", "created_at")
+
+
+class SpooledInputFile(InputFile):
+    """Файл для отправки в Telegram, читаемый частями из буфера"""
+
+    def __init__(self, file: IO[bytes], filename: str, **kwargs):
+        super().__init__(filename=filename, **kwargs)
+        self.file = file
+
+    async def read(self, bot: Bot) -> AsyncGenerator[bytes, None]:
+        self.file.seek(0)
+        while chunk := self.file.read(self.chunk_size):
+            yield chunk
+
+    def close(self) -> None:
+        self.file.close()
+
+
+async def export_vault(user_id: int, fmt: str = "csv", compress: bool = False) -> SpooledInputFile:
+    """Экспорт паролей и заметок пользователя в CSV/JSON документ.
+
+    Строки пишутся в буфер по мере чтения курсора; буфер сбрасывается
+    на диск после SPOOL_MAX_SIZE байт, так что память не растёт вместе
+    с объёмом хранилища.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Неподдерживаемый формат: {fmt}")
+
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    raw = gzip.GzipFile(fileobj=spool, mode="wb") if compress else spool
+    text = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+    try:
+        rows = 0
+        if fmt == "csv":
+            writer = csv.writer(text)
+            writer.writerow(EXPORT_FIELDS)
+            async for kind, row_id, password_id, value, created_at in iter_user_vault(user_id):
+                writer.writerow([kind, row_id, password_id, value, created_at.isoformat()])
+                rows += 1
+        else:
+            text.write("[")
+            async for record in iter_user_vault(user_id):
+                item = dict(zip(EXPORT_FIELDS, record))
+                item["created_at"] = item["created_at"].isoformat()
+                text.write(("," if rows else "") + "\n" + json.dumps(item, ensure_ascii=False))
+                rows += 1
+            text.write("\n]\n")
+
+        text.flush()
+        text.detach()
+        if compress:
+            raw.close()
+    except Exception:
+        spool.close()
+        raise
+
+    filename = f"zpassword_{user_id}.{fmt}" + (".gz" if compress else "")
+    logger.info(f"Экспорт пользователя {user_id}: {rows} строк")
+    return SpooledInputFile(spool, filename=filename)
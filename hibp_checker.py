@@ -5,32 +5,51 @@ from typing import Optional
 
 logger = logging.getLogger(__name__)
 
+# Одна сессия (пул HTTP-соединений) на процесс, создаётся при первом запросе
+_session: Optional[aiohttp.ClientSession] = None
 
-async def check_hibp(password: str) -> Optional[str]:
-    """
-    Проверяет пароль через Have I Been Pwned API с использованием k-анонимности.
-    Возвращает количество утечек или None, если возникла ошибка.
-    """
-    try:
-        sha1_hash = hashlib.sha1(password.encode('utf-8')).hexdigest().upper()
-        prefix = sha1_hash[:5]
-        suffix = sha1_hash[5:]
 
-        async with aiohttp.ClientSession() as session:
-            url = f"https://api.pwnedpasswords.com/range/{prefix}"
-            async with session.get(url) as response:
-                if response.status != 200:
-                    logger.error(f"HIBP API вернул ошибку: {response.status}")
-                    return None
+def get_hibp_session() -> aiohttp.ClientSession:
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession()
+    return _session
 
-                text = await response.text()
-                for line in text.splitlines():
-                    hash_suffix, count = line.split(':')
-                    if hash_suffix == suffix:
-                        return f"⚠️ Пароль найден в {count} утечках!"
 
-                return "✅ Пароль не найден в известных утечках"
+async def close_hibp_session() -> None:
+    """Закрытие HTTP-сессии HIBP при остановке процесса"""
+    global _session
+    if _session is not None:
+        await _session.close()
+        _session = None
 
+
+async def check_hibp(password: str) -> Optional[int]:
+    """
+    Проверяет пароль через Have I Been Pwned API с использованием k-анонимности:
+    в API уходят только первые 5 символов SHA-1.
+    Возвращает количество утечек (0 — не найден) или None, если возникла ошибка.
+    """
+    sha1_hash = hashlib.sha1(password.encode('utf-8')).hexdigest().upper()
+    prefix, suffix = sha1_hash[:5], sha1_hash[5:]
+
+    try:
+        url = f"https://api.pwnedpasswords.com/range/{prefix}"
+        async with get_hibp_session().get(url) as response:
+            if response.status != 200:
+                logger.error(f"HIBP API вернул ошибку: {response.status}")
+                return None
+            text = await response.text()
     except Exception as e:
         logger.error(f"Ошибка проверки HIBP: {e}")
         return None
+
+    for line in text.splitlines():
+        hash_suffix, _, count = line.partition(':')
+        if hash_suffix.strip() == suffix:
+            try:
+                return int(count)
+            except ValueError:
+                logger.warning(f"Некорректная строка в ответе HIBP: {line}")
+                return None
+    return 0
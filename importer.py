@@ -0,0 +1,165 @@
+import csv
+import gzip
+import io
+import json
+import logging
+from datetime import datetime, timezone
+from typing import IO, AsyncIterator, Iterator, List, Optional
+
+from crud import import_vault, ensure_user
+from security import password_digest, password_strength
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH_SIZE = 5000
+JSON_CHUNK_SIZE = 64 * 1024
+MAX_IMPORT_ERRORS = 20
+
+
+class ImportStats:
+    """Итоги импорта: загружено, отклонено, первые ошибки"""
+
+    def __init__(self):
+        self.passwords = 0
+        self.notes = 0
+        self.rejected = 0
+        self.errors: List[str] = []
+
+    def reject(self, line: int, reason: str) -> None:
+        self.rejected += 1
+        if len(self.errors) < MAX_IMPORT_ERRORS:
+            self.errors.append(f"строка {line}: {reason}")
+
+
+def _open_text(file: IO[bytes]) -> io.TextIOWrapper:
+    file.seek(0)
+    magic = file.read(2)
+    file.seek(0)
+    raw = gzip.GzipFile(fileobj=file, mode="rb") if magic == b"\x1f\x8b" else file
+    return io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+
+
+def _iter_csv(text: IO[str]) -> Iterator[dict]:
+    yield from csv.DictReader(text)
+
+
+def _iter_json(text: IO[str]) -> Iterator[dict]:
+    """Потоковый разбор JSON-массива (в одну строку или с отступами) или JSON Lines.
+
+    Файл читается кусками по JSON_CHUNK_SIZE, значения верхнего уровня
+    извлекаются JSONDecoder.raw_decode; скобки и запятые массива пропускаются.
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos = "", 0
+    started = eof = False
+    while True:
+        while pos < len(buffer):
+            char = buffer[pos]
+            if char.isspace() or char in ",]" or (char == "[" and not started):
+                started = started or not char.isspace()
+                pos += 1
+            else:
+                break
+        if pos == len(buffer) and eof:
+            return
+        if pos < len(buffer):
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Значение может быть разрезано границей куска
+                if eof:
+                    raise
+            else:
+                # Число в конце куска может продолжаться в следующем
+                if end < len(buffer) or eof:
+                    started = True
+                    pos = end
+                    yield item
+                    continue
+        chunk = text.read(JSON_CHUNK_SIZE)
+        eof = not chunk
+        buffer, pos = buffer[pos:] + chunk, 0
+
+
+def _to_int(value) -> Optional[int]:
+    return int(value) if value not in (None, "") else None
+
+
+def _utc_suffix(value: str) -> str:
+    # datetime.fromisoformat до Python 3.11 не понимает «Z»
+    return value[:-1] + "+00:00" if value.endswith(("Z", "z")) else value
+
+
+def _validate(item: dict) -> tuple:
+    """Проверка строки по тем же ограничениям, что и модели записи"""
+    kind = item.get("kind") or "password"
+    value = item.get("value") or item.get("password") or item.get("content") or ""
+    if kind == "password":
+        if not 8 <= len(value) <= 15:
+            raise ValueError("длина пароля должна быть от 8 до 15 символов")
+    elif kind == "note":
+        value = value.strip()
+        if not 1 <= len(value) <= 255:
+            raise ValueError("длина заметки должна быть от 1 до 255 символов")
+    else:
+        raise ValueError(f"неизвестный тип записи: {kind}")
+
+    created_at = item.get("created_at")
+    created_at = datetime.fromisoformat(_utc_suffix(created_at)) if created_at else datetime.now()
+    if created_at.tzinfo is not None:
+        # created_at в БД — TIMESTAMP без пояса: COPY не примет aware-значение
+        created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+    digest = score = entropy = None
+    if kind == "password":
+        digest = password_digest(value)
+        score, entropy = password_strength(value)
+    return (
+        kind, _to_int(item.get("id")), _to_int(item.get("password_id")), value,
+        created_at, digest, score, entropy
+    )
+
+
+async def _batches(rows: Iterator[dict], stats: ImportStats) -> AsyncIterator[List[tuple]]:
+    batch = []
+    for line, item in enumerate(rows, start=1):
+        try:
+            batch.append(_validate(item))
+        except (ValueError, TypeError, AttributeError) as e:
+            stats.reject(line, str(e))
+            continue
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def import_document(
+    user_id: int,
+    username: Optional[str],
+    file: IO[bytes],
+    filename: str
+) -> ImportStats:
+    """Импорт CSV/JSON (в т.ч. .gz) документа в хранилище пользователя.
+
+    Файл разбирается потоково и загружается пачками по IMPORT_BATCH_SIZE
+    строк, поэтому в памяти не держится весь документ.
+    """
+    stats = ImportStats()
+    text = _open_text(file)
+    name = filename.lower()
+    rows = _iter_json(text) if ".json" in name or ".jsonl" in name else _iter_csv(text)
+
+    await ensure_user(user_id, username)
+    try:
+        stats.passwords, stats.notes = await import_vault(user_id, _batches(rows, stats))
+    except (json.JSONDecodeError, csv.Error, UnicodeDecodeError, OSError) as e:
+        raise ValueError(f"Некорректный файл: {e}") from e
+    finally:
+        text.detach()
+
+    logger.info(
+        f"Импорт пользователя {user_id}: паролей {stats.passwords}, "
+        f"заметок {stats.notes}, отклонено {stats.rejected}"
+    )
+    return stats
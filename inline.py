@@ -0,0 +1,140 @@
+import html
+import asyncio
+import logging
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+from aiogram import Router
+from aiogram.enums import ParseMode
+from aiogram.types import (
+    InlineQuery, InlineQueryResultArticle, InlineQueryResultsButton, InputTextMessageContent
+)
+
+from config import INLINE_RESULTS, INLINE_POOL_SIZE, INLINE_CACHE_TIME, INLINE_DEFAULT_LENGTH
+from keyboards import inline_password_keyboard
+from password import PASSWORD_POLICIES, generate_password
+
+logger = logging.getLogger(__name__)
+router = Router()
+
+MIN_LENGTH = 4
+MAX_LENGTH = 64
+PIN_DEFAULT_LENGTH = 6
+# Длины, которые набирают чаще всего: их запас готовится при запуске
+WARM_LENGTHS = (8, 10, 12, 16, 20, 24, 32)
+# Сколько паролей дозаполнение генерирует между переключениями цикла событий
+REFILL_CHUNK = 2
+
+POLICY_LABELS = {
+    "strong": "буквы, цифры, символы",
+    "alnum": "буквы и цифры",
+    "pin": "только цифры",
+}
+
+_background_tasks: Set[asyncio.Task] = set()
+
+
+class PasswordPool:
+    """Запас готовых паролей для inline-ответов по (длина, политика).
+
+    Каждый пароль выдаётся ровно один раз. Когда запас опускается ниже
+    половины, он дозаполняется фоновой задачей небольшими порциями; если
+    запаса не хватило (редкая длина), недостающее генерируется на месте.
+    """
+
+    def __init__(self, size: int = INLINE_POOL_SIZE):
+        self.size = size
+        self._pools: Dict[Tuple[int, str], Deque[str]] = {}
+        self._refilling: Set[Tuple[int, str]] = set()
+
+    def take(self, length: int, policy: str, count: int) -> List[str]:
+        key = (length, policy)
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = self._pools[key] = deque()
+        taken = [pool.popleft() for _ in range(min(count, len(pool)))]
+        taken.extend(generate_password(str(length), policy) for _ in range(count - len(taken)))
+        if len(pool) < self.size // 2:
+            self.refill_later(length, policy)
+        return taken
+
+    def refill_later(self, length: int, policy: str) -> None:
+        key = (length, policy)
+        if key in self._refilling:
+            return
+        self._refilling.add(key)
+        task = asyncio.create_task(self._refill(key))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+    async def _refill(self, key: Tuple[int, str]) -> None:
+        length, policy = key
+        pool = self._pools.setdefault(key, deque())
+        try:
+            while len(pool) < self.size:
+                pool.extend(
+                    generate_password(str(length), policy)
+                    for _ in range(min(REFILL_CHUNK, self.size - len(pool)))
+                )
+                await asyncio.sleep(0)
+        except Exception as e:
+            logger.error(f"Ошибка пополнения запаса паролей {key}: {e}", exc_info=True)
+        finally:
+            self._refilling.discard(key)
+
+    def warm(self) -> None:
+        """Фоновое заполнение запаса для частых длин (вызывается при запуске)"""
+        for length in WARM_LENGTHS:
+            self.refill_later(length, "strong")
+
+
+pool = PasswordPool()
+
+
+def parse_query(query: str) -> Tuple[int, str]:
+    """«16», «alnum 20», «pin» → (длина, политика); неизвестное игнорируется"""
+    length: Optional[int] = None
+    policy = "strong"
+    for word in query.lower().split():
+        if word.isdecimal():
+            length = int(word)
+        elif word in PASSWORD_POLICIES:
+            policy = word
+    if length is None:
+        length = PIN_DEFAULT_LENGTH if policy == "pin" else INLINE_DEFAULT_LENGTH
+    return max(MIN_LENGTH, min(length, MAX_LENGTH)), policy
+
+
+@router.inline_query()
+async def inline_passwords(inline_query: InlineQuery):
+    """Готовые пароли по запросу «@бот 16»: без обращений к БД и FSM.
+
+    Ответ личный (is_personal): Telegram не покажет эти пароли другому
+    пользователю с тем же запросом, а повторный набор того же запроса в
+    течение INLINE_CACHE_TIME секунд обслуживается из кэша Telegram.
+    """
+    length, policy = parse_query(inline_query.query)
+    markup = inline_password_keyboard(inline_query.query)
+    description = f"{length} символов: {POLICY_LABELS[policy]}"
+    results = [
+        InlineQueryResultArticle(
+            id=str(index),
+            title=password,
+            description=description,
+            input_message_content=InputTextMessageContent(
+                message_text=f"<code>{html.escape(password)}</code>",
+                parse_mode=ParseMode.HTML
+            ),
+            reply_markup=markup
+        )
+        for index, password in enumerate(pool.take(length, policy, INLINE_RESULTS))
+    ]
+    try:
+        await inline_query.answer(
+            results,
+            cache_time=INLINE_CACHE_TIME,
+            is_personal=True,
+            button=InlineQueryResultsButton(text="🔐 Открыть менеджер паролей", start_parameter="inline")
+        )
+    except Exception as e:
+        logger.error(f"Ошибка inline-ответа: {e}")
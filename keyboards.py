@@ -1,11 +1,14 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from typing import List
 
+from callback_tokens import Action, issue
+
 def main_menu() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(
         inline_keyboard=[
             [InlineKeyboardButton(text="🔐 Сгенерировать", callback_data="generate")],
             [InlineKeyboardButton(text="📋 Список паролей", callback_data="pswd_list")],
+            [InlineKeyboardButton(text="📝 Заметки", callback_data="notes_list")],
             [InlineKeyboardButton(text="🛡 Проверить свой пароль", callback_data="check_custom")],
             [InlineKeyboardButton(text="🌐 Проверить надежность Online", callback_data="check_hibp")],  # Новая кнопка
             [
@@ -25,16 +28,26 @@ def password_length_keyboard() -> InlineKeyboardMarkup:
         ]
     )
 
-def passwords_pagination(page: int, total_pages: int, passwords: List[object],
-                         per_page: int = 15) -> InlineKeyboardMarkup:
+PASSWORD_ORDER_LABELS = {
+    "new": "🕒 Новые",
+    "weak": "📉 Слабые",
+    "lt60": "⚠️ < 60",
+}
+
+def passwords_pagination(page: int, total_pages: int, passwords: List[object], user_id: int,
+                         per_page: int = 15, order: str = "new") -> InlineKeyboardMarkup:
     page = max(1, min(page, total_pages))
     keyboard = []
 
     for pswd in passwords[:per_page]:
         keyboard.append([
             InlineKeyboardButton(
-                text=f"🔑 {pswd.password}",
-                callback_data=f"copy_{pswd.password}"
+                text=f"{'♻️' if pswd.reused else '🔑'} {pswd.password}",
+                callback_data=issue(Action.COPY, user_id, pswd.id)
+            ),
+            InlineKeyboardButton(
+                text="📝",
+                callback_data=f"note_add_{pswd.id}"
             ),
             InlineKeyboardButton(
                 text="🗑️ Удалить",
@@ -44,19 +57,73 @@ def passwords_pagination(page: int, total_pages: int, passwords: List[object],
 
     pagination_row = []
     if page > 1:
-        pagination_row.append(InlineKeyboardButton(text="⬅️", callback_data=f"pswd_page_{page - 1}"))
+        pagination_row.append(InlineKeyboardButton(text="⬅️", callback_data=f"pswd_page_{page - 1}_{order}"))
     pagination_row.append(InlineKeyboardButton(text=f"{page}/{total_pages}", callback_data="current"))
     if page < total_pages:
-        pagination_row.append(InlineKeyboardButton(text="➡️", callback_data=f"pswd_page_{page + 1}"))
+        pagination_row.append(InlineKeyboardButton(text="➡️", callback_data=f"pswd_page_{page + 1}_{order}"))
 
     keyboard.append(pagination_row)
+    keyboard.append([
+        InlineKeyboardButton(
+            text=f"• {label}" if mode == order else label,
+            callback_data=f"pswd_page_1_{mode}"
+        )
+        for mode, label in PASSWORD_ORDER_LABELS.items()
+    ])
+    keyboard.append([InlineKeyboardButton(text="🗄 Архив", callback_data="pswd_archive")])
     keyboard.append([InlineKeyboardButton(text="🔙 Главное меню", callback_data="main_menu")])
 
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
-def after_generation_keyboard(password: str, length: int) -> InlineKeyboardMarkup:
+def archive_pagination(page: int, total_pages: int) -> InlineKeyboardMarkup:
+    pagination_row = []
+    if page > 1:
+        pagination_row.append(InlineKeyboardButton(text="⬅️", callback_data=f"archive_page_{page - 1}"))
+    pagination_row.append(InlineKeyboardButton(text=f"{page}/{total_pages}", callback_data="current"))
+    if page < total_pages:
+        pagination_row.append(InlineKeyboardButton(text="➡️", callback_data=f"archive_page_{page + 1}"))
+
     return InlineKeyboardMarkup(
         inline_keyboard=[
+            pagination_row,
+            [InlineKeyboardButton(text="📋 Список паролей", callback_data="pswd_list")],
+            [InlineKeyboardButton(text="🔙 Главное меню", callback_data="main_menu")]
+        ]
+    )
+
+def notes_pagination(page: int, total_pages: int, notes: List[object],
+                     searching: bool = False) -> InlineKeyboardMarkup:
+    keyboard = []
+    for number, note in enumerate(notes, start=1):
+        keyboard.append([
+            InlineKeyboardButton(text=f"🗑️ Удалить №{number}", callback_data=f"note_del_{note.id}")
+        ])
+
+    pagination_row = []
+    if page > 1:
+        pagination_row.append(InlineKeyboardButton(text="⬅️", callback_data=f"notes_page_{page - 1}"))
+    pagination_row.append(InlineKeyboardButton(text=f"{page}/{total_pages}", callback_data="current"))
+    if page < total_pages:
+        pagination_row.append(InlineKeyboardButton(text="➡️", callback_data=f"notes_page_{page + 1}"))
+    keyboard.append(pagination_row)
+
+    search_row = [InlineKeyboardButton(text="🔍 Поиск", callback_data="notes_search")]
+    if searching:
+        search_row.append(InlineKeyboardButton(text="✖️ Сбросить поиск", callback_data="notes_reset"))
+    keyboard.append(search_row)
+    keyboard.append([InlineKeyboardButton(text="🔙 Главное меню", callback_data="main_menu")])
+
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+def after_generation_keyboard(password_id: int, length: int, user_id: int) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(
+                    text="🔍 Анализ пароля",
+                    callback_data=issue(Action.CHECK, user_id, password_id)
+                ),
+            ],
             [
                 InlineKeyboardButton(
                     text="🔄 Генерировать еще",
@@ -70,4 +137,18 @@ def after_generation_keyboard(password: str, length: int) -> InlineKeyboardMarku
                 )
             ]
         ]
-    )
\ No newline at end of file
+    )
+
+
+def inline_password_keyboard(query: str) -> InlineKeyboardMarkup:
+    """Под паролем, отправленным через inline-режим: новый набор вариантов"""
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(
+                    text="🔄 Другие варианты",
+                    switch_inline_query_current_chat=query
+                )
+            ]
+        ]
+    )
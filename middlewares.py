@@ -0,0 +1,212 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.middleware import FSMContextMiddleware
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from aiogram.types import Update
+
+from config import USER_QUEUE_SIZE, MAX_INFLIGHT_UPDATES
+
+logger = logging.getLogger(__name__)
+
+# Нажатия, из которых имеет смысл выполнить только последнее: пока
+# предыдущее ждёт в очереди, новое его заменяет
+COLLAPSIBLE_PREFIXES = ("regenerate_", "pswd_page_", "archive_page_", "notes_page_")
+# Inline-запросы приходят на каждое нажатие клавиши: нужен только последний
+INLINE_COLLAPSE_KEY = "inline_query"
+
+
+def _collapse_key(event: Update) -> Optional[str]:
+    if event.inline_query is not None:
+        return INLINE_COLLAPSE_KEY
+    query = event.callback_query
+    if query is None or not query.data:
+        return None
+    for prefix in COLLAPSIBLE_PREFIXES:
+        if query.data.startswith(prefix):
+            return prefix
+    return None
+
+
+async def _answer_dropped(event: Update, text: Optional[str] = None) -> None:
+    """Снимает «часики» с отброшенного нажатия"""
+    if event.callback_query is None:
+        return
+    try:
+        await event.callback_query.answer(text)
+    except Exception as e:
+        logger.debug(f"Не удалось ответить на отброшенный callback: {e}")
+
+
+class _Pending:
+    __slots__ = ("key", "dropped")
+
+    def __init__(self, key: Optional[str]):
+        self.key = key
+        self.dropped = False
+
+
+class _UserQueue:
+    __slots__ = ("lock", "waiting")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.waiting: List[_Pending] = []
+
+
+class UserQueueMiddleware(BaseMiddleware):
+    """Последовательная обработка обновлений каждого пользователя.
+
+    Обновления одного пользователя выполняются строго по очереди, поэтому
+    обработчики не гоняются за одни и те же данные FSM. В очереди
+    пользователя ждут не больше USER_QUEUE_SIZE обновлений, лишние
+    отбрасываются, повторные нажатия из COLLAPSIBLE_PREFIXES схлопываются
+    в последнее. Всего одновременно выполняется не больше
+    MAX_INFLIGHT_UPDATES обработчиков, и каждый пользователь занимает
+    максимум один слот, так что один флудящий пользователь не забирает
+    соединения пула у остальных.
+    """
+
+    def __init__(self, queue_size: int = USER_QUEUE_SIZE, max_inflight: int = MAX_INFLIGHT_UPDATES):
+        self.queue_size = queue_size
+        self.max_inflight = max_inflight
+        self._queues: Dict[int, _UserQueue] = {}
+        # Создаётся в запущенном цикле событий (в Python 3.9 привязан к циклу)
+        self._inflight: Optional[asyncio.Semaphore] = None
+        self.dropped = 0
+
+    async def __call__(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+        if self._inflight is None:
+            self._inflight = asyncio.Semaphore(self.max_inflight)
+
+        queue = self._queues.get(user.id)
+        if queue is None:
+            queue = self._queues[user.id] = _UserQueue()
+
+        key = _collapse_key(event)
+        if key is not None:
+            for pending in queue.waiting:
+                if pending.key == key:
+                    pending.dropped = True
+        if sum(not pending.dropped for pending in queue.waiting) >= self.queue_size:
+            self.dropped += 1
+            await _answer_dropped(event, "⏳ Слишком много запросов, подождите")
+            return None
+
+        pending = _Pending(key)
+        queue.waiting.append(pending)
+        try:
+            async with queue.lock:
+                if not pending.dropped:
+                    async with self._inflight:
+                        return await handler(event, data)
+        finally:
+            queue.waiting.remove(pending)
+            if not queue.waiting and not queue.lock.locked():
+                self._queues.pop(user.id, None)
+
+        self.dropped += 1
+        await _answer_dropped(event)
+        return None
+
+
+class CachedFSMContext(FSMContext):
+    """FSMContext, работающий с копией состояния в памяти.
+
+    Данные читаются из хранилища один раз, при первом обращении; все
+    изменения копятся в памяти и записываются flush() в конце обработки
+    обновления — не больше одной записи состояния и одной записи данных.
+    """
+
+    def __init__(self, storage: BaseStorage, key: StorageKey, state: Optional[str]):
+        super().__init__(storage=storage, key=key)
+        self._state = state
+        self._data: Optional[Dict[str, Any]] = None
+        self._state_changed = False
+        self._data_changed = False
+
+    async def _load(self) -> Dict[str, Any]:
+        if self._data is None:
+            self._data = await self.storage.get_data(key=self.key)
+        return self._data
+
+    async def get_state(self) -> Optional[str]:
+        return self._state
+
+    async def set_state(self, state: StateType = None) -> None:
+        value = state.state if isinstance(state, State) else state
+        if value != self._state:
+            self._state = value
+            self._state_changed = True
+
+    async def get_data(self) -> Dict[str, Any]:
+        return dict(await self._load())
+
+    async def get_value(self, key: str, default: Any = None) -> Any:
+        return (await self._load()).get(key, default)
+
+    async def set_data(self, data: Mapping[str, Any]) -> None:
+        self._data = dict(data)
+        self._data_changed = True
+
+    async def update_data(self, data: Optional[Mapping[str, Any]] = None, **kwargs: Any) -> Dict[str, Any]:
+        if data:
+            kwargs.update(data)
+        current = await self._load()
+        current.update(kwargs)
+        self._data_changed = True
+        return dict(current)
+
+    async def clear(self) -> None:
+        await self.set_state(None)
+        if self._data != {}:
+            await self.set_data({})
+
+    async def flush(self) -> None:
+        if self._state_changed:
+            await self.storage.set_state(key=self.key, state=self._state)
+            self._state_changed = False
+        if self._data_changed:
+            await self.storage.set_data(key=self.key, data=self._data)
+            self._data_changed = False
+
+
+class CachedFSMContextMiddleware(FSMContextMiddleware):
+    """Замена встроенного FSMContextMiddleware с CachedFSMContext.
+
+    Ставится после UserQueueMiddleware, поэтому состояние читается уже
+    после того, как закончились предыдущие обновления пользователя.
+    Inline-запросы FSM не используют и хранилище не читают.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        data["fsm_storage"] = self.storage
+        if event.inline_query is not None:
+            return await handler(event, data)
+        context = self.resolve_event_context(data["bot"], data)
+        if context is None:
+            return await handler(event, data)
+        async with self.events_isolation.lock(key=context.key):
+            state = CachedFSMContext(self.storage, context.key, await context.get_state())
+            data.update({"state": state, "raw_state": await state.get_state()})
+            try:
+                return await handler(event, data)
+            finally:
+                await state.flush()
@@ -0,0 +1,25 @@
+CREATE TABLE IF NOT EXISTS users (
+    user_id BIGINT PRIMARY KEY,
+    username VARCHAR(32)
+);
+
+CREATE TABLE IF NOT EXISTS passwords (
+    id SERIAL PRIMARY KEY,
+    user_id BIGINT REFERENCES users(user_id)
+        ON DELETE CASCADE,
+    password VARCHAR(15) NOT NULL,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS notes (
+    id SERIAL PRIMARY KEY,
+    user_id BIGINT REFERENCES users(user_id)
+        ON DELETE CASCADE,
+    password_id INT REFERENCES passwords(id)
+        ON DELETE CASCADE,
+    content VARCHAR(255) NOT NULL,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_passwords_user
+    ON passwords(user_id, created_at DESC);
@@ -0,0 +1,2 @@
+CREATE INDEX IF NOT EXISTS idx_notes_user
+    ON notes(user_id, created_at DESC);
@@ -0,0 +1,16 @@
+-- Фоновая очистка данных пользователя: строки с id <= watermark скрыты
+-- на чтении и удаляются воркером пачками
+CREATE TABLE IF NOT EXISTS purge_jobs (
+    user_id BIGINT PRIMARY KEY REFERENCES users(user_id)
+        ON DELETE CASCADE,
+    password_watermark INT NOT NULL DEFAULT 0,
+    note_watermark INT NOT NULL DEFAULT 0,
+    deleted_passwords BIGINT NOT NULL DEFAULT 0,
+    deleted_notes BIGINT NOT NULL DEFAULT 0,
+    requested_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    finished_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_purge_jobs_pending
+    ON purge_jobs(requested_at)
+    WHERE finished_at IS NULL;
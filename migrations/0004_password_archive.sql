@@ -0,0 +1,14 @@
+-- Холодный архив паролей сверх лимита: сжатые блоки по пользователю
+CREATE TABLE IF NOT EXISTS password_archive (
+    id BIGSERIAL PRIMARY KEY,
+    user_id BIGINT NOT NULL REFERENCES users(user_id)
+        ON DELETE CASCADE,
+    first_id INT NOT NULL,
+    last_id INT NOT NULL,
+    row_count INT NOT NULL,
+    block BYTEA NOT NULL,
+    archived_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_password_archive_user
+    ON password_archive(user_id, last_id DESC);
@@ -0,0 +1,10 @@
+-- Ключевой хеш пароля (HMAC-SHA256) для поиска повторов без открытого текста.
+-- Существующие строки заполняет фоновая задача backfill.py
+ALTER TABLE passwords ADD COLUMN IF NOT EXISTS digest BYTEA;
+
+CREATE INDEX IF NOT EXISTS idx_passwords_digest
+    ON passwords(user_id, digest);
+
+CREATE INDEX IF NOT EXISTS idx_passwords_digest_missing
+    ON passwords(id)
+    WHERE digest IS NULL;
@@ -0,0 +1,11 @@
+-- Оценка сложности считается один раз при сохранении, сортировка и фильтр
+-- по ней идут по индексу. Существующие строки заполняет backfill.py
+ALTER TABLE passwords ADD COLUMN IF NOT EXISTS score REAL;
+ALTER TABLE passwords ADD COLUMN IF NOT EXISTS entropy REAL;
+
+CREATE INDEX IF NOT EXISTS idx_passwords_score
+    ON passwords(user_id, score, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_passwords_score_missing
+    ON passwords(id)
+    WHERE score IS NULL;
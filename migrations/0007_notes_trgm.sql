@@ -0,0 +1,11 @@
+-- Поиск по подстроке в заметках: GIN-индекс pg_trgm ускоряет ILIKE '%...%'.
+-- Без расширения (нет contrib) поиск работает, но без индекса
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm') THEN
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        CREATE INDEX IF NOT EXISTS idx_notes_content_trgm
+            ON notes USING gin (content gin_trgm_ops);
+    END IF;
+END
+$$;
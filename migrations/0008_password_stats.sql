@@ -0,0 +1,70 @@
+-- Инкрементальные агрегаты для /stats по (user_id, день, длина пароля).
+-- Поддерживаются statement-триггерами на passwords, поэтому дашборд
+-- читает несколько строк по индексу вместо агрегации по всей истории
+CREATE TABLE IF NOT EXISTS password_stats (
+    user_id BIGINT NOT NULL REFERENCES users(user_id)
+        ON DELETE CASCADE,
+    day DATE NOT NULL,
+    length SMALLINT NOT NULL,
+    created INT NOT NULL DEFAULT 0,
+    deleted INT NOT NULL DEFAULT 0,
+    scored INT NOT NULL DEFAULT 0,
+    score_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    breached INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day, length)
+);
+
+CREATE OR REPLACE FUNCTION password_stats_on_insert() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO password_stats AS s (user_id, day, length, created, scored, score_sum)
+    SELECT user_id, created_at::date, length(password),
+        COUNT(*), COUNT(score), COALESCE(SUM(score), 0)
+    FROM new_rows
+    GROUP BY 1, 2, 3
+    ON CONFLICT (user_id, day, length) DO UPDATE SET
+        created = s.created + EXCLUDED.created,
+        scored = s.scored + EXCLUDED.scored,
+        score_sum = s.score_sum + EXCLUDED.score_sum;
+    RETURN NULL;
+END
+$$;
+
+-- Строки, удаляемые фоновой очисткой (id <= watermark), не учитываются:
+-- статистика таких пользователей сбрасывается в clear_all_data
+CREATE OR REPLACE FUNCTION password_stats_on_delete() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO password_stats AS s (user_id, day, length, deleted)
+    SELECT o.user_id, CURRENT_DATE, length(o.password), COUNT(*)
+    FROM old_rows o
+    WHERE o.id > COALESCE(
+        (SELECT password_watermark FROM purge_jobs j WHERE j.user_id = o.user_id), 0
+    )
+    GROUP BY 1, 2, 3
+    ON CONFLICT (user_id, day, length) DO UPDATE SET
+        deleted = s.deleted + EXCLUDED.deleted;
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS password_stats_insert ON passwords;
+CREATE TRIGGER password_stats_insert
+    AFTER INSERT ON passwords
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION password_stats_on_insert();
+
+DROP TRIGGER IF EXISTS password_stats_delete ON passwords;
+CREATE TRIGGER password_stats_delete
+    AFTER DELETE ON passwords
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION password_stats_on_delete();
+
+-- Однократное заполнение по уже сохранённым паролям
+INSERT INTO password_stats (user_id, day, length, created, scored, score_sum)
+SELECT user_id, created_at::date, length(password),
+    COUNT(*), COUNT(score), COALESCE(SUM(score), 0)
+FROM passwords
+WHERE user_id IS NOT NULL
+GROUP BY 1, 2, 3
+ON CONFLICT (user_id, day, length) DO NOTHING;
@@ -0,0 +1,53 @@
+-- Шифрование паролей (AES-GCM, envelope): ключ данных пользователя хранится
+-- обёрнутым мастер-ключом, пароль — в password_enc (nonce || шифртекст).
+-- Открытые строки шифрует фоновая задача backfill.py
+CREATE TABLE IF NOT EXISTS user_keys (
+    user_id BIGINT PRIMARY KEY REFERENCES users(user_id)
+        ON DELETE CASCADE,
+    wrapped_key BYTEA NOT NULL,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+ALTER TABLE passwords ALTER COLUMN password DROP NOT NULL;
+ALTER TABLE passwords ADD COLUMN IF NOT EXISTS password_enc BYTEA;
+ALTER TABLE passwords ADD COLUMN IF NOT EXISTS length SMALLINT;
+UPDATE passwords SET length = length(password) WHERE length IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_passwords_plaintext
+    ON passwords(id)
+    WHERE password IS NOT NULL;
+
+ALTER TABLE password_archive ADD COLUMN IF NOT EXISTS encrypted BOOLEAN NOT NULL DEFAULT FALSE;
+
+-- Длина для статистики берётся из колонки: у зашифрованных строк password NULL
+CREATE OR REPLACE FUNCTION password_stats_on_insert() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO password_stats AS s (user_id, day, length, created, scored, score_sum)
+    SELECT user_id, created_at::date, COALESCE(length, length(password)),
+        COUNT(*), COUNT(score), COALESCE(SUM(score), 0)
+    FROM new_rows
+    GROUP BY 1, 2, 3
+    ON CONFLICT (user_id, day, length) DO UPDATE SET
+        created = s.created + EXCLUDED.created,
+        scored = s.scored + EXCLUDED.scored,
+        score_sum = s.score_sum + EXCLUDED.score_sum;
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION password_stats_on_delete() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO password_stats AS s (user_id, day, length, deleted)
+    SELECT o.user_id, CURRENT_DATE, COALESCE(o.length, length(o.password)), COUNT(*)
+    FROM old_rows o
+    WHERE o.id > COALESCE(
+        (SELECT password_watermark FROM purge_jobs j WHERE j.user_id = o.user_id), 0
+    )
+    GROUP BY 1, 2, 3
+    ON CONFLICT (user_id, day, length) DO UPDATE SET
+        deleted = s.deleted + EXCLUDED.deleted;
+    RETURN NULL;
+END
+$$;
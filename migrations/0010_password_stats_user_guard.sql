@@ -0,0 +1,18 @@
+-- Удаление пользователя каскадно удаляет его пароли; триггер не должен
+-- писать статистику пользователю, которого уже нет (FK password_stats)
+CREATE OR REPLACE FUNCTION password_stats_on_delete() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO password_stats AS s (user_id, day, length, deleted)
+    SELECT o.user_id, CURRENT_DATE, COALESCE(o.length, length(o.password)), COUNT(*)
+    FROM old_rows o
+    WHERE o.id > COALESCE(
+        (SELECT password_watermark FROM purge_jobs j WHERE j.user_id = o.user_id), 0
+    )
+    AND EXISTS (SELECT 1 FROM users u WHERE u.user_id = o.user_id)
+    GROUP BY 1, 2, 3
+    ON CONFLICT (user_id, day, length) DO UPDATE SET
+        deleted = s.deleted + EXCLUDED.deleted;
+    RETURN NULL;
+END
+$$;
@@ -0,0 +1,4 @@
+-- Заметки по паролю: каскадное удаление по FK и перенос заметок в архив
+-- вместе с паролями без полного просмотра заметок пользователя
+CREATE INDEX IF NOT EXISTS idx_notes_password
+    ON notes(password_id);
@@ -0,0 +1,5 @@
+-- Порядок «new», перенос старых паролей в архив и последний пароль
+-- пользователя идут по id в пределах user_id: без индекса строки
+-- пользователя сортировались бы на каждой странице
+CREATE INDEX IF NOT EXISTS idx_passwords_user_id
+    ON passwords(user_id, id DESC);
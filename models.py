@@ -49,4 +49,55 @@ class Note(BaseModel):
         stripped = value.strip()
         if not stripped:
             raise ValueError("Содержание не может быть пустым!")
-        return stripped
\ No newline at end of file
+        return stripped
+
+class PasswordRow:
+    """Облегчённая строка passwords для пути чтения (без валидации pydantic).
+
+    Данные приходят из нашей же БД и уже прошли валидацию при записи,
+    поэтому повторно их не проверяем.
+    """
+    __slots__ = ("id", "user_id", "password", "created_at", "reused")
+
+    def __init__(self, id: int, user_id: int, password: str, created_at: datetime,
+                 reused: bool = False):
+        self.id = id
+        self.user_id = user_id
+        self.password = password
+        self.created_at = created_at
+        self.reused = reused
+
+    def __repr__(self) -> str:
+        return f"PasswordRow(id={self.id}, user_id={self.user_id})"
+
+
+class NoteRow:
+    """Облегчённая строка notes для пути чтения (без валидации pydantic).
+
+    password заполняется, если заметка выбрана вместе с паролем (JOIN).
+    """
+    __slots__ = ("id", "user_id", "password_id", "content", "created_at", "password")
+
+    def __init__(self, id: int, user_id: int, password_id: int, content: str,
+                 created_at: datetime, password: Optional[str] = None):
+        self.id = id
+        self.user_id = user_id
+        self.password_id = password_id
+        self.content = content
+        self.created_at = created_at
+        self.password = password
+
+    def __repr__(self) -> str:
+        return f"NoteRow(id={self.id}, user_id={self.user_id})"
+
+class ArchivedPassword:
+    """Строка из распакованного архивного блока password_archive"""
+    __slots__ = ("id", "password", "created_at")
+
+    def __init__(self, id: int, password: str, created_at: datetime):
+        self.id = id
+        self.password = password
+        self.created_at = created_at
+
+    def __repr__(self) -> str:
+        return f"ArchivedPassword(id={self.id})"
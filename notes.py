@@ -0,0 +1,152 @@
+import html
+import logging
+from typing import Optional, cast
+
+from aiogram import Router, F
+from aiogram.enums import ParseMode
+from aiogram.filters import StateFilter
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.types import Message, CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup
+
+from decorators import message_cleaner, MessageManager
+from crud import add_note, get_notes, get_note_count, delete_note
+from keyboards import main_menu, notes_pagination
+
+logger = logging.getLogger(__name__)
+router = Router()
+
+NOTES_PER_PAGE = 8
+
+class NoteStates(StatesGroup):
+    AWAITING_NOTE_CONTENT = State()
+    AWAITING_NOTE_QUERY = State()
+
+# Кнопки заметок начинаются с note, сообщения ждём только в своих состояниях
+router.callback_query.filter(F.data.startswith("note"))
+router.message.filter(StateFilter(NoteStates))
+
+CANCEL_KEYBOARD = InlineKeyboardMarkup(
+    inline_keyboard=[[InlineKeyboardButton(text="❌ Отмена", callback_data="main_menu")]]
+)
+
+async def send_notes_page(message: Message, state: FSMContext, user_id: int, page: int = 1):
+    """Страница заметок с паролями: один запрос на страницу + подсчёт"""
+    data = await state.get_data()
+    query: Optional[str] = data.get('notes_query')
+
+    total = await get_note_count(user_id, query)
+    total_pages = max((total + NOTES_PER_PAGE - 1) // NOTES_PER_PAGE, 1)
+    page = max(1, min(page, total_pages))
+    notes = await get_notes(user_id, page, NOTES_PER_PAGE, query)
+
+    header = "📝 <b>Заметки</b>"
+    if query:
+        header += f" (поиск: «{html.escape(query)}»)"
+    lines = [
+        f"{number}. {html.escape(note.content)}\n"
+        f"    🔑 <code>{html.escape(note.password or '—')}</code> · {note.created_at:%d.%m.%Y}"
+        for number, note in enumerate(notes, start=1)
+    ]
+    text = header + "\n\n" + ("\n".join(lines) if lines else "📭 Нет заметок")
+
+    msg = await message.answer(
+        text,
+        parse_mode=ParseMode.HTML,
+        reply_markup=notes_pagination(page, total_pages, notes, bool(query))
+    )
+    manager = data.get('manager', MessageManager())
+    manager.track(msg)
+    await state.update_data(manager=manager)
+
+@router.callback_query(F.data == "notes_list")
+@router.callback_query(F.data.startswith("notes_page_"))
+@message_cleaner
+async def show_notes(callback: CallbackQuery, state: FSMContext):
+    try:
+        page = int(callback.data.rsplit("_", 1)[1]) if callback.data.startswith("notes_page_") else 1
+        await send_notes_page(callback.message, state, callback.from_user.id, page)
+    except Exception as e:
+        logger.error(f"Ошибка загрузки заметок: {e}")
+        await callback.answer("⛔ Ошибка загрузки")
+
+@router.callback_query(F.data.startswith("note_add_"))
+@message_cleaner
+async def start_add_note(callback: CallbackQuery, state: FSMContext):
+    try:
+        password_id = int(callback.data.rsplit("_", 1)[1])
+        await state.set_state(NoteStates.AWAITING_NOTE_CONTENT)
+        await state.update_data(note_password_id=password_id)
+        msg = await callback.message.answer(
+            "✍️ <b>Введите текст заметки к паролю:</b>\n▫️ До 255 символов",
+            parse_mode=ParseMode.HTML,
+            reply_markup=CANCEL_KEYBOARD
+        )
+        data = await state.get_data()
+        manager = data.get('manager', MessageManager())
+        manager.track(msg)
+        await state.update_data(manager=manager)
+    except Exception as e:
+        logger.error(f"Ошибка начала заметки: {e}")
+        await callback.answer("⚠️ Ошибка", show_alert=True)
+
+@router.message(NoteStates.AWAITING_NOTE_CONTENT)
+@message_cleaner
+async def process_note_content(message: Message, state: FSMContext):
+    user_id = cast(int, message.from_user.id)
+    try:
+        content = (message.text or "").strip()
+        if not content:
+            await message.answer("⚠️ Заметка не может быть пустой", reply_markup=CANCEL_KEYBOARD)
+            return
+
+        data = await state.get_data()
+        await add_note(user_id, data['note_password_id'], content)
+        await state.set_state(None)
+        await message.answer("✅ Заметка сохранена")
+        await send_notes_page(message, state, user_id)
+    except Exception as e:
+        logger.error(f"Ошибка сохранения заметки: {e}")
+        await state.set_state(None)
+        await message.answer("⚠️ Ошибка сохранения заметки", reply_markup=main_menu())
+
+@router.callback_query(F.data == "notes_search")
+@message_cleaner
+async def start_notes_search(callback: CallbackQuery, state: FSMContext):
+    await state.set_state(NoteStates.AWAITING_NOTE_QUERY)
+    msg = await callback.message.answer("🔍 Введите текст для поиска по заметкам:", reply_markup=CANCEL_KEYBOARD)
+    data = await state.get_data()
+    manager = data.get('manager', MessageManager())
+    manager.track(msg)
+    await state.update_data(manager=manager)
+
+@router.message(NoteStates.AWAITING_NOTE_QUERY)
+@message_cleaner
+async def process_notes_search(message: Message, state: FSMContext):
+    try:
+        await state.set_state(None)
+        await state.update_data(notes_query=(message.text or "").strip()[:100] or None)
+        await send_notes_page(message, state, message.from_user.id)
+    except Exception as e:
+        logger.error(f"Ошибка поиска заметок: {e}")
+        await message.answer("⚠️ Ошибка поиска", reply_markup=main_menu())
+
+@router.callback_query(F.data == "notes_reset")
+@message_cleaner
+async def reset_notes_search(callback: CallbackQuery, state: FSMContext):
+    try:
+        await state.update_data(notes_query=None)
+        await send_notes_page(callback.message, state, callback.from_user.id)
+    except Exception as e:
+        logger.error(f"Ошибка загрузки заметок: {e}")
+        await callback.answer("⛔ Ошибка загрузки")
+
+@router.callback_query(F.data.startswith("note_del_"))
+@message_cleaner
+async def delete_note_handler(callback: CallbackQuery, state: FSMContext):
+    note_id = int(callback.data.rsplit("_", 1)[1])
+    if await delete_note(note_id, callback.from_user.id):
+        await callback.answer("🗑️ Удалено!", show_alert=True)
+        await send_notes_page(callback.message, state, callback.from_user.id)
+    else:
+        await callback.answer("⚠️ Ошибка", show_alert=True)
@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Set, Union
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import DeleteMessage, DeleteMessages, Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import Message
+
+from cache import TTLCache
+from config import (
+    TG_GLOBAL_RATE, TG_CHAT_RATE, TG_CHAT_BURST, TG_RETRY_ATTEMPTS, TG_DELETE_BATCH_WINDOW
+)
+
+logger = logging.getLogger(__name__)
+
+# Удаления (уборка старых сообщений) уступают ответам пользователю
+LOW_PRIORITY_METHODS = (DeleteMessage, DeleteMessages)
+# Пока ответ ждёт токен, низкий приоритет проверяет очередь с этим шагом
+LOW_PRIORITY_POLL = 0.05
+# Ограничение Bot API на deleteMessages
+DELETE_BATCH_LIMIT = 100
+
+ChatId = Union[int, str]
+
+_background_tasks: Set[asyncio.Task] = set()
+
+
+async def _delete(message: Message) -> None:
+    try:
+        await message.delete()
+    except Exception as e:
+        logger.error(f"Ошибка удаления: {e}")
+
+
+def delete_later(message: Message) -> None:
+    """Удаление сообщения в фоновой задаче, без ожидания ответа Telegram.
+
+    Через OutboundScheduler такие удаления идут с низким приоритетом и
+    пачками deleteMessages.
+    """
+    task = asyncio.create_task(_delete(message))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+class TokenBucket:
+    """Корзина токенов: rate в секунду, до capacity подряд"""
+    __slots__ = ("rate", "capacity", "tokens", "updated", "blocked_until")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        # До этого момента запросы не отправляются (ответ 429 с retry_after)
+        self.blocked_until = 0.0
+
+    def wait_time(self, now: float) -> float:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+
+class _DeleteBatch:
+    __slots__ = ("message_ids", "done")
+
+    def __init__(self):
+        self.message_ids: List[int] = []
+        self.done: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+class OutboundScheduler(BaseRequestMiddleware):
+    """Планировщик исходящих запросов к Bot API (middleware сессии Bot).
+
+    Запросы с chat_id проходят через общую корзину токенов (TG_GLOBAL_RATE)
+    и корзину чата (TG_CHAT_RATE, всплеск до TG_CHAT_BURST). Удаления
+    сообщений идут с низким приоритетом: берут только общий токен и только
+    когда его не ждут ответы пользователям. Одиночные deleteMessage одного
+    чата, пришедшие в окне TG_DELETE_BATCH_WINDOW, отправляются одним
+    deleteMessages. На 429 запрос повторяется после retry_after, а чат
+    на это время замораживается. Запросы без chat_id (answerCallbackQuery,
+    setWebhook и т.п.) не ограничиваются.
+    """
+
+    def __init__(self, global_rate: float = TG_GLOBAL_RATE):
+        # Общий лимит без всплесков: запросы идут равномерно
+        self._global = TokenBucket(global_rate, 1)
+        self._chats = TTLCache(maxsize=100_000, ttl=60)
+        self._urgent = 0
+        self._deletes: Dict[ChatId, _DeleteBatch] = {}
+
+    def _chat_bucket(self, chat_id: ChatId) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(TG_CHAT_RATE, TG_CHAT_BURST)
+        self._chats.set(chat_id, bucket)
+        return bucket
+
+    async def _acquire(self, chat_id: Optional[ChatId], low: bool) -> None:
+        if not low:
+            self._urgent += 1
+        try:
+            while True:
+                now = time.monotonic()
+                chat = self._chat_bucket(chat_id) if chat_id is not None else None
+                wait = self._global.wait_time(now)
+                if chat is not None:
+                    # Удаления на лимит чата не влияют, но ждут его заморозку
+                    chat_wait = chat.wait_time(now)
+                    wait = max(wait, chat.blocked_until - now if low else chat_wait)
+                if low and self._urgent:
+                    wait = max(wait, LOW_PRIORITY_POLL)
+                if wait <= 0:
+                    self._global.take()
+                    if chat is not None and not low:
+                        chat.take()
+                    return
+                await asyncio.sleep(wait)
+        finally:
+            if not low:
+                self._urgent -= 1
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType]
+    ) -> Response[TelegramType]:
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None:
+            return await make_request(bot, method)
+        if isinstance(method, DeleteMessage):
+            return await self._coalesce_delete(make_request, bot, method)
+        return await self._send(make_request, bot, method, chat_id)
+
+    async def _send(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+        chat_id: ChatId
+    ) -> Response[TelegramType]:
+        low = isinstance(method, LOW_PRIORITY_METHODS)
+        attempt = 0
+        while True:
+            await self._acquire(chat_id, low)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if attempt >= TG_RETRY_ATTEMPTS:
+                    raise
+                attempt += 1
+                logger.warning(
+                    f"⏳ {type(method).__name__} в чат {chat_id}: лимит Telegram, "
+                    f"повтор через {e.retry_after} с"
+                )
+                self._chat_bucket(chat_id).blocked_until = time.monotonic() + e.retry_after
+
+    async def _coalesce_delete(
+        self,
+        make_request: NextRequestMiddlewareType[bool],
+        bot: Bot,
+        method: DeleteMessage
+    ) -> Response[bool]:
+        batch = self._deletes.get(method.chat_id)
+        if batch is not None:
+            batch.message_ids.append(method.message_id)
+            return await asyncio.shield(batch.done)
+
+        batch = self._deletes[method.chat_id] = _DeleteBatch()
+        batch.message_ids.append(method.message_id)
+        try:
+            await asyncio.sleep(TG_DELETE_BATCH_WINDOW)
+        except asyncio.CancelledError:
+            batch.done.cancel()
+            raise
+        finally:
+            del self._deletes[method.chat_id]
+
+        if len(batch.message_ids) == 1:
+            # Одиночное удаление: сохраняем точную ошибку deleteMessage
+            return await self._send(make_request, bot, method, method.chat_id)
+        try:
+            for start in range(0, len(batch.message_ids), DELETE_BATCH_LIMIT):
+                response = await self._send(
+                    make_request, bot,
+                    DeleteMessages(
+                        chat_id=method.chat_id,
+                        message_ids=batch.message_ids[start:start + DELETE_BATCH_LIMIT]
+                    ),
+                    method.chat_id
+                )
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                batch.done.cancel()
+            else:
+                batch.done.set_exception(e)
+            raise
+        batch.done.set_result(response)
+        return response
@@ -5,11 +5,23 @@ from typing import Literal
 ALLOWED_LENGTHS = Literal['8', '10', '12']
 SYMBOLS = "!@#$%^&*()_+-=[]{}|;:,.<>?/~"
 
+# Наборы символов: из каждого в пароле есть хотя бы один
+PASSWORD_POLICIES = {
+    "strong": (string.ascii_lowercase, string.ascii_uppercase, string.digits, SYMBOLS),
+    "alnum": (string.ascii_lowercase, string.ascii_uppercase, string.digits),
+    "pin": (string.digits,),
+}
+_ALPHABETS = {policy: ''.join(categories) for policy, categories in PASSWORD_POLICIES.items()}
 
-def generate_password(length: ALLOWED_LENGTHS) -> str:
+# Генератор на os.urandom: пароли не должны зависеть от состояния PRNG
+_random = random.SystemRandom()
+
+
+def generate_password(length: ALLOWED_LENGTHS, policy: str = "strong") -> str:
     """
-    Генерирует безопасный пароль заданной длины (8/10/12 символов)
-    с гарантированным наличием всех категорий символов.
+    Генерирует безопасный пароль заданной длины (8/10/12 символов в
+    интерфейсе, произвольной в inline-режиме) с гарантированным наличием
+    всех категорий символов политики (PASSWORD_POLICIES).
 
     Соответствует требованиям системы:
     - Фиксированные длины из интерфейса (keyboards.py)
@@ -20,23 +32,18 @@ def generate_password(length: ALLOWED_LENGTHS) -> str:
     generate_password('12') → "aD4#kL9!zX@1"
     """
     length_int = int(length)
+    categories = PASSWORD_POLICIES[policy]
+    alphabet = _ALPHABETS[policy]
 
-    categories = {
-        'lowercase': string.ascii_lowercase,
-        'uppercase': string.ascii_uppercase,
-        'digits': string.digits,
-        'symbols': SYMBOLS
-    }
-
-    required = [random.choice(chars) for chars in categories.values()]
+    required = [_random.choice(chars) for chars in categories]
 
     remaining_chars = [
-        random.choice(''.join(categories.values()))
+        _random.choice(alphabet)
         for _ in range(length_int - len(required))
     ]
 
     password_chars = required + remaining_chars
-    random.shuffle(password_chars)
+    _random.shuffle(password_chars)
 
     return ''.join(password_chars)
 
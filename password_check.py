@@ -1,15 +1,18 @@
+import html
 import logging
-from aiogram import F, Router
+from aiogram import Bot, F, Router
+from aiogram.filters import StateFilter
 from aiogram.types import Message, CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.enums import ParseMode
+from callback_tokens import NOT_FOUND_TEXT, Action, action
 from decorators import message_cleaner, MessageManager
 from keyboards import main_menu
 from password import estimate_crack_time
 from security import calculate_password_strength
-import hashlib
-import aiohttp
+from crud import get_password, record_breach_check
+from hibp_checker import check_hibp
 
 router = Router()
 logger = logging.getLogger(__name__)
@@ -18,6 +21,11 @@ class PasswordCheckStates(StatesGroup):
     AWAITING_CUSTOM_PASSWORD = State()
     AWAITING_HIBP_PASSWORD = State()
 
+# Проверки паролей: анализ сложности и HIBP. Остальные нажатия и сообщения
+# вне этих состояний отсекаются одним фильтром на весь роутер
+router.callback_query.filter(F.data.startswith("check_"))
+router.message.filter(StateFilter(PasswordCheckStates))
+
 @router.callback_query(F.data == "check_custom")
 @message_cleaner
 async def start_custom_check(callback: CallbackQuery, state: FSMContext):
@@ -64,7 +72,7 @@ async def process_custom_check(message: Message, state: FSMContext):
         offline_md5_time = estimate_crack_time(password, mode='md5')
 
         response = (
-            f"🔍 <b>Анализ надежности пароля:</b>\n<code>{password}</code>\n\n"
+            f"🔍 <b>Анализ надежности пароля:</b>\n<code>{html.escape(password)}</code>\n\n"
             f"📈 Энтропия: {report['entropy']:.1f} бит\n"
             f"⚖️ Сложность: {report['score']:.1f}/100\n\n"
             f"⏳ <b>Время взлома при компрометации:</b>\n"
@@ -119,41 +127,21 @@ async def process_hibp_check(message: Message, state: FSMContext):
             await state.clear()
             return
 
-        sha1_hash = hashlib.sha1(password.encode('utf-8')).hexdigest().upper()
-        prefix = sha1_hash[:5]
-        suffix = sha1_hash[5:]
-
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"https://api.pwnedpasswords.com/range/{prefix}") as response:
-                if response.status != 200:
-                    raise Exception(f"HIBP API вернул ошибку: {response.status}")
-                hashes = await response.text()
-
-        found = False
-        count = 0
-        for line in hashes.splitlines():
-            if not line.strip():
-                continue
-            try:
-                hash_suffix, occurrences = line.split(':', 1)
-                if hash_suffix.strip() == suffix:
-                    found = True
-                    count = int(occurrences.strip())
-                    break
-            except ValueError as e:
-                logger.warning(f"Некорректная строка в ответе HIBP: {line} - {e}")
-                continue
-
-        if found:
+        count = await check_hibp(password)
+        if count is None:
+            raise RuntimeError("HIBP недоступен")
+
+        if count:
+            await record_breach_check(message.from_user.id, password)
             response = (
-                f"🔍 Проверка пароля в HIBP:\n<code>{password}</code>\n\n"
+                f"🔍 Проверка пароля в HIBP:\n<code>{html.escape(password)}</code>\n\n"
                 f"⚠️ Этот пароль был скомпрометирован!\n"
                 f"📊 Обнаружен {count} раз(а) в утечках\n"
                 f"Рекомендуем сменить пароль немедленно!"
             )
         else:
             response = (
-                f"🔍 Проверка пароля в HIBP:\n<code>{password}</code>\n\n"
+                f"🔍 Проверка пароля в HIBP:\n<code>{html.escape(password)}</code>\n\n"
                 f"✅ Пароль не найден в известных утечках"
             )
 
@@ -167,3 +155,39 @@ async def process_hibp_check(message: Message, state: FSMContext):
             reply_markup=main_menu()
         )
         await state.clear()
+
+@action(Action.CHECK)
+@message_cleaner
+async def check_password(callback: CallbackQuery, password_id: int, state: FSMContext, bot: Bot):
+    """Анализ сгенерированного пароля по кнопке с токеном"""
+    try:
+        password = await get_password(callback.from_user.id, password_id)
+        if password is None:
+            await callback.answer(NOT_FOUND_TEXT, show_alert=True)
+            return
+        report, recommendations = calculate_password_strength(password)
+        recommendations_text = "\n".join(
+            f"• {rec}" for rec in recommendations) if recommendations else "✅ Пароль соответствует базовым требованиям"
+
+        response = (
+            f"🔍 Анализ пароля:\n<code>{html.escape(password)}</code>\n\n"
+            f"📈 Энтропия: {report['entropy']:.1f} бит\n"
+            f"⚖️ Сложность: {report['score']:.1f}/100\n\n"
+            f"📝 Рекомендации:\n{recommendations_text}"
+        )
+
+        msg = await callback.message.answer(
+            response,
+            parse_mode=ParseMode.HTML,
+            reply_markup=main_menu()
+        )
+
+        data = await state.get_data()
+        manager = data.get('manager', MessageManager())
+        manager.track(msg)
+        await state.set_state(None)
+        await state.update_data(manager=manager)
+        await callback.answer()
+    except Exception as e:
+        logger.error(f"Ошибка проверки: {e}")
+        await callback.answer("⚠️ Ошибка анализа", show_alert=True)
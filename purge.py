@@ -0,0 +1,56 @@
+import asyncio
+import logging
+from typing import Optional
+
+from config import PURGE_BATCH_SIZE, PURGE_PAUSE_SECONDS, PURGE_POLL_SECONDS
+from crud import purge_batch
+
+logger = logging.getLogger(__name__)
+
+# Создаётся в запущенном цикле событий (в Python 3.9 Event привязан к циклу)
+_wakeup: Optional[asyncio.Event] = None
+
+
+def wake_purge_worker() -> None:
+    """Будит воркер сразу после новой заявки на очистку.
+
+    Воркер работает только в основном процессе: при BOT_WORKERS > 0
+    обработчики выполняются в процессах-воркерах, где _wakeup не создан, и
+    вызов ничего не делает. Тогда очистка начнётся при следующем опросе
+    очереди, то есть не позже чем через PURGE_POLL_SECONDS.
+    """
+    if _wakeup:
+        _wakeup.set()
+
+
+async def run_purge_worker() -> None:
+    """Фоновое удаление данных, помеченных clear_all_data.
+
+    Удаляет по PURGE_BATCH_SIZE строк с паузой PURGE_PAUSE_SECONDS между
+    пачками, чтобы не держать долгие блокировки и не создавать всплесков
+    WAL. Без работы проверяет очередь раз в PURGE_POLL_SECONDS.
+    """
+    global _wakeup
+    _wakeup = asyncio.Event()
+    logger.info("🧹 Воркер очистки запущен")
+    while True:
+        try:
+            result = await purge_batch(PURGE_BATCH_SIZE)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка воркера очистки: {e}")
+            result = None
+
+        if result:
+            user_id, deleted, done = result
+            if done:
+                logger.info(f"🧹 Очистка данных пользователя {user_id} завершена")
+            await asyncio.sleep(PURGE_PAUSE_SECONDS)
+            continue
+
+        _wakeup.clear()
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=PURGE_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,128 @@
+import logging
+import operator
+from typing import Any, Hashable, Iterator, List, Tuple
+
+from aiogram import Router
+from aiogram.dispatcher.event.handler import FilterObject, HandlerObject
+from aiogram.filters import Command, StateFilter
+from aiogram.fsm.state import State, StatesGroup
+from magic_filter.operations import CallOperation, ComparatorOperation, GetAttributeOperation
+
+logger = logging.getLogger(__name__)
+
+# Условие фильтра в виде, пригодном для сравнения:
+# ("eq", поле, значение), ("prefix", поле, префикс), ("truthy", поле),
+# ("states", frozenset), ("commands", frozenset) или ("opaque", id)
+Atom = Tuple[Hashable, ...]
+
+
+def _state_names(value: Any) -> frozenset:
+    if value is None:
+        return frozenset({None})
+    if isinstance(value, State):
+        return frozenset({value.state})
+    if isinstance(value, type) and issubclass(value, StatesGroup):
+        return frozenset(value.__all_states_names__)
+    if isinstance(value, str):
+        return frozenset({value})
+    return frozenset({("opaque", id(value))})
+
+
+def _atom(event_filter: FilterObject) -> Atom:
+    if event_filter.magic is not None:
+        ops = event_filter.magic._operations
+        if ops and isinstance(ops[0], GetAttributeOperation):
+            field = ops[0].name
+            if len(ops) == 1:
+                return ("truthy", field)
+            if (len(ops) == 2 and isinstance(ops[1], ComparatorOperation)
+                    and ops[1].comparator is operator.eq):
+                return ("eq", field, ops[1].right)
+            if (len(ops) == 3 and isinstance(ops[1], GetAttributeOperation)
+                    and ops[1].name == "startswith" and isinstance(ops[2], CallOperation)
+                    and len(ops[2].args) == 1 and isinstance(ops[2].args[0], str)):
+                return ("prefix", field, ops[2].args[0])
+        return ("opaque", id(event_filter.magic))
+
+    callback = event_filter.callback
+    if isinstance(callback, State):
+        return ("states", _state_names(callback))
+    if isinstance(callback, StateFilter):
+        names = frozenset()
+        for state in callback.states:
+            if state == "*":
+                return ("opaque", id(callback))
+            names |= _state_names(state)
+        return ("states", names)
+    if isinstance(callback, Command) and callback.magic is None:
+        return ("commands", frozenset(
+            command if isinstance(command, str) else ("opaque", id(command))
+            for command in callback.commands
+        ))
+    return ("opaque", id(callback))
+
+
+def _implied(atom: Atom, by: List[Atom]) -> bool:
+    """Выполняется ли atom для любого события, прошедшего все условия by"""
+    kind = atom[0]
+    for other in by:
+        if other == atom:
+            return True
+        if kind == "prefix" and other[1] == atom[1]:
+            if other[0] in ("eq", "prefix") and isinstance(other[2], str) \
+                    and other[2].startswith(atom[2]):
+                return True
+        elif kind == "truthy" and other[1] == atom[1]:
+            if other[0] == "prefix" and other[2] or other[0] == "eq" and other[2]:
+                return True
+        elif kind in ("states", "commands") and other[0] == kind:
+            if other[1] <= atom[1]:
+                return True
+    return False
+
+
+def _handlers(router: Router, event: str, inherited: List[Atom]) -> Iterator[Tuple[HandlerObject, List[Atom]]]:
+    """Обработчики события в порядке их проверки aiogram с условиями
+    корневых фильтров роутеров"""
+    observer = router.observers[event]
+    atoms = inherited + [_atom(f) for f in observer._handler.filters or ()]
+    for handler in observer.handlers:
+        yield handler, atoms + [_atom(f) for f in handler.filters or ()]
+    for sub_router in router.sub_routers:
+        yield from _handlers(sub_router, event, atoms)
+
+
+def _name(handler: HandlerObject) -> str:
+    callback = handler.callback
+    return f"{callback.__module__}.{getattr(callback, '__qualname__', callback)}"
+
+
+def find_shadowed_handlers(router: Router) -> List[str]:
+    """Обработчики, до которых не дойдёт ни одно обновление.
+
+    Обработчик недостижим, если раньше него (в порядке include_router и
+    регистрации) стоит обработчик того же события, чьи фильтры заведомо
+    пропускают всё, что пропустили бы его собственные: одинаковые
+    F.data == ..., перекрывающий F.data.startswith(...), то же состояние.
+    Фильтры, которые нельзя разобрать, считаются несравнимыми.
+    """
+    problems = []
+    for event in router.observers:
+        if event in ("update", "error"):
+            continue
+        seen: List[Tuple[HandlerObject, List[Atom]]] = []
+        for handler, atoms in _handlers(router, event, []):
+            for earlier, earlier_atoms in seen:
+                if all(_implied(atom, atoms) for atom in earlier_atoms):
+                    problems.append(
+                        f"{event}: {_name(handler)} недостижим, его перекрывает {_name(earlier)}"
+                    )
+                    break
+            seen.append((handler, atoms))
+    return problems
+
+
+def check_routes(router: Router) -> None:
+    """Проверка графа роутеров при запуске: недостижимые обработчики в лог"""
+    for problem in find_shadowed_handlers(router):
+        logger.warning(f"⚠️ {problem}")
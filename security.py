@@ -1,7 +1,11 @@
 import math
 from typing import Tuple, Dict, List
 import hashlib
-import aiohttp
+import hmac
+
+from config import PASSWORD_DIGEST_KEY
+
+_DIGEST_KEY = PASSWORD_DIGEST_KEY.encode('utf-8')
 
 class AdvancedPasswordAnalyzer:
     """Модернизированный анализатор с учетом современных реалий атак"""
@@ -140,26 +144,18 @@ class AdvancedPasswordAnalyzer:
             recommendations.append("Используйте минимум 12 символов")
         return report, recommendations
 
-async def check_hibp(password: str) -> Tuple[bool, int]:
-    """Проверка пароля через HIBP API"""
-    sha1_hash = hashlib.sha1(password.encode('utf-8')).hexdigest().upper()
-    prefix, suffix = sha1_hash[:5], sha1_hash[5:]
-
-    async with aiohttp.ClientSession() as session:
-        url = f"https://api.pwnedpasswords.com/range/{prefix}"
-        async with session.get(url) as response:
-            if response.status != 200:
-                return False, 0
-            text = await response.text()
-            for line in text.splitlines():
-                hash_suffix, count = line.split(':')
-                if hash_suffix == suffix:
-                    return True, int(count)
-            return False, 0
+def password_strength(password: str) -> Tuple[float, float]:
+    """Оценка сложности и энтропия для хранения в passwords.score/entropy"""
+    analyzer = AdvancedPasswordAnalyzer(password)
+    return float(analyzer.complexity_score), float(analyzer.entropy)
+
+def password_digest(password: str) -> bytes:
+    """Ключевой хеш пароля: поиск повторов и ключ кэшей без открытого текста"""
+    return hmac.new(_DIGEST_KEY, password.encode('utf-8'), hashlib.sha256).digest()
 
 def calculate_password_strength(password: str) -> tuple[dict, list]:
-    entropy = len(password) * 4
-    score = min(100, entropy * 5)
+    """Оценка для экранов проверки: та же, что в passwords.score для сортировки и фильтра"""
+    score, entropy = password_strength(password)
 
     recommendations = []
     if len(password) < 12:
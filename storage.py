@@ -0,0 +1,204 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Hashable, Mapping, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import DEFAULT_DESTINY, BaseStorage, StateType, StorageKey
+
+from cache import TTLCache
+from config import FSM_STORAGE, FSM_TTL, FSM_MAX_KEYS, ConfigError
+from decorators import MessageManager
+
+logger = logging.getLogger(__name__)
+
+_MANAGER_TAG = "__message_manager__"
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, MessageManager):
+        return {_MANAGER_TAG: [value.message_stack.tolist(), value.last_user_message]}
+    raise TypeError(f"Тип {type(value).__name__} нельзя сохранить в FSM")
+
+
+def _decode(value: Dict[str, Any]) -> Any:
+    if _MANAGER_TAG in value:
+        message_ids, last_user_message = value[_MANAGER_TAG]
+        return MessageManager(message_ids, last_user_message)
+    return value
+
+
+def dumps_data(data: Mapping[str, Any]) -> str:
+    """JSON данных FSM; MessageManager сохраняется как список ID"""
+    return json.dumps(data, default=_encode, separators=(",", ":"))
+
+
+def loads_data(raw: str) -> Dict[str, Any]:
+    return json.loads(raw, object_hook=_decode)
+
+
+def _state_name(state: StateType) -> Optional[str]:
+    return state.state if isinstance(state, State) else state
+
+
+class _Record:
+    __slots__ = ("state", "data")
+
+    def __init__(self, state: Optional[str] = None, data: Optional[Dict[str, Any]] = None):
+        self.state = state
+        self.data = data
+
+
+class TTLMemoryStorage(BaseStorage):
+    """FSM-хранилище в памяти с вытеснением по TTL и лимиту ключей.
+
+    Запись живёт FSM_TTL секунд с последнего изменения, всего хранится не
+    больше FSM_MAX_KEYS записей (самые давние вытесняются). Пустые записи
+    (без состояния и данных) удаляются сразу. Ключ личного чата сжимается
+    до (bot_id, user_id).
+    """
+
+    def __init__(self, maxsize: int = FSM_MAX_KEYS, ttl: float = FSM_TTL):
+        self._records = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    @staticmethod
+    def _key(key: StorageKey) -> Hashable:
+        if (
+            key.chat_id == key.user_id and key.thread_id is None
+            and key.business_connection_id is None and key.destiny == DEFAULT_DESTINY
+        ):
+            return (key.bot_id, key.user_id)
+        return (key.bot_id, key.chat_id, key.user_id, key.thread_id,
+                key.business_connection_id, key.destiny)
+
+    def _store(self, key: Hashable, record: _Record) -> None:
+        if record.state is None and not record.data:
+            self._records.pop(key)
+        else:
+            self._records.set(key, record)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        compact = self._key(key)
+        record = self._records.get(compact) or _Record()
+        record.state = _state_name(state)
+        self._store(compact, record)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        record = self._records.get(self._key(key))
+        return record.state if record else None
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        compact = self._key(key)
+        record = self._records.get(compact) or _Record()
+        record.data = dict(data) if data else None
+        self._store(compact, record)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        record = self._records.get(self._key(key))
+        return dict(record.data) if record and record.data else {}
+
+    async def close(self) -> None:
+        self._records.clear()
+
+
+class SQLiteStorage(BaseStorage):
+    """FSM-хранилище в файле SQLite: переживает перезапуск и общее для воркеров.
+
+    Запросы выполняются в отдельном потоке, чтобы не блокировать цикл
+    событий. Данные хранятся в JSON, записи старше FSM_TTL не читаются
+    и периодически удаляются.
+    """
+
+    PURGE_EVERY = 1000
+
+    def __init__(self, path: str, ttl: float = FSM_TTL):
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fsm-sqlite")
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS fsm (
+                key TEXT PRIMARY KEY,
+                state TEXT,
+                data TEXT,
+                expires_at REAL NOT NULL
+            )
+        """)
+        self._writes = 0
+
+    @staticmethod
+    def _key(key: StorageKey) -> str:
+        return ":".join(str(part) for part in (
+            key.bot_id, key.chat_id, key.user_id, key.thread_id,
+            key.business_connection_id, key.destiny
+        ))
+
+    async def _run(self, sql: str, *args: Any) -> Optional[tuple]:
+        def execute() -> Optional[tuple]:
+            return self._conn.execute(sql, args).fetchone()
+        return await asyncio.get_running_loop().run_in_executor(self._executor, execute)
+
+    async def _write(self, sql: str, *args: Any) -> None:
+        await self._run(sql, *args)
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            await self._run("DELETE FROM fsm WHERE expires_at < ?", time.time())
+
+    async def _read(self, column: str, key: StorageKey) -> Optional[str]:
+        row = await self._run(
+            f"SELECT {column} FROM fsm WHERE key = ? AND expires_at >= ?",
+            self._key(key), time.time()
+        )
+        return row[0] if row else None
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await self._write(
+            """INSERT INTO fsm (key, state, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT (key) DO UPDATE SET state = excluded.state, expires_at = excluded.expires_at""",
+            self._key(key), _state_name(state), time.time() + self.ttl
+        )
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return await self._read("state", key)
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        await self._write(
+            """INSERT INTO fsm (key, data, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT (key) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at""",
+            self._key(key), dumps_data(data) if data else None, time.time() + self.ttl
+        )
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        raw = await self._read("data", key)
+        return loads_data(raw) if raw else {}
+
+    async def close(self) -> None:
+        if self._conn is not None:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._conn.close)
+            self._conn = None
+            self._executor.shutdown(wait=False)
+
+
+def create_storage() -> BaseStorage:
+    """FSM-хранилище по FSM_STORAGE: memory, sqlite:///путь или redis://..."""
+    if FSM_STORAGE == "memory":
+        return TTLMemoryStorage()
+    if FSM_STORAGE.startswith("sqlite:///"):
+        return SQLiteStorage(FSM_STORAGE[len("sqlite:///"):])
+    if FSM_STORAGE.startswith(("redis://", "rediss://")):
+        try:
+            from aiogram.fsm.storage.redis import RedisStorage
+        except ImportError as e:
+            raise ConfigError("Для FSM_STORAGE=redis:// нужен пакет redis") from e
+        return RedisStorage.from_url(
+            FSM_STORAGE,
+            state_ttl=int(FSM_TTL),
+            data_ttl=int(FSM_TTL),
+            json_dumps=dumps_data,
+            json_loads=loads_data
+        )
+    raise ConfigError(f"Неизвестное FSM_STORAGE: {FSM_STORAGE}")
@@ -0,0 +1,8 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+# config.py требует токен при импорте; в тестах Telegram не используется
+os.environ.setdefault("BOT_TOKEN", "123:abc")
@@ -0,0 +1,12 @@
+import asyncio
+from unittest import mock
+
+import crud
+
+
+def test_encrypt_plaintext_passwords_without_master_key_skips_database():
+    get_connection = mock.MagicMock()
+    with mock.patch.object(crud, "encryption_enabled", return_value=False), \
+            mock.patch.object(crud, "get_connection", get_connection):
+        assert asyncio.run(crud.encrypt_plaintext_passwords(100)) == 0
+    get_connection.assert_not_called()
@@ -0,0 +1,38 @@
+import asyncio
+from contextlib import asynccontextmanager
+from unittest import mock
+
+import database
+
+
+def _run_init_db(current_version: int, partitions: int) -> mock.AsyncMock:
+    """init_db на поддельном соединении; возвращает мок partition_tables"""
+    conn = mock.MagicMock()
+    conn.fetchval = mock.AsyncMock(return_value=True)
+    conn.execute = mock.AsyncMock()
+
+    @asynccontextmanager
+    async def fake_connection(*args, **kwargs):
+        yield conn
+
+    partition_tables = mock.AsyncMock()
+    with mock.patch.object(database, "get_connection", fake_connection), \
+            mock.patch.object(database, "_current_version", mock.AsyncMock(return_value=current_version)), \
+            mock.patch.object(database, "partition_tables", partition_tables), \
+            mock.patch.object(database, "PG_HASH_PARTITIONS", partitions):
+        asyncio.run(database.init_db())
+    return partition_tables
+
+
+def _latest_version() -> int:
+    return database.load_migrations()[-1][0]
+
+
+def test_partitions_applied_on_already_migrated_schema():
+    partition_tables = _run_init_db(_latest_version(), partitions=8)
+    partition_tables.assert_awaited_once_with(8)
+
+
+def test_no_partitioning_when_disabled():
+    partition_tables = _run_init_db(_latest_version(), partitions=0)
+    partition_tables.assert_not_awaited()
@@ -0,0 +1,47 @@
+import io
+import json
+from datetime import datetime
+from unittest import mock
+
+import pytest
+
+import importer
+
+ITEMS = [
+    {"kind": "password", "id": 1, "value": "Abc,def]12[x", "created_at": "2024-01-02T03:04:05"},
+    {"kind": "note", "id": 2, "password_id": 1, "value": "заметка {1}", "created_at": None},
+    {"kind": "password", "id": 3, "value": "Zz9!Zz9!Zz9!", "created_at": "2024-01-02T03:04:05+03:00"},
+]
+
+
+def _parse(text: str, chunk_size: int = importer.JSON_CHUNK_SIZE) -> list:
+    with mock.patch.object(importer, "JSON_CHUNK_SIZE", chunk_size):
+        return list(importer._iter_json(io.StringIO(text)))
+
+
+@pytest.mark.parametrize("text", [
+    json.dumps(ITEMS),
+    json.dumps(ITEMS, indent=2, ensure_ascii=False),
+    "\n".join(json.dumps(item) for item in ITEMS) + "\n",
+    "[\n" + ",\n".join(json.dumps(item) for item in ITEMS) + "\n]\n",
+], ids=["one-line", "pretty", "jsonl", "export"])
+@pytest.mark.parametrize("chunk_size", [7, 64 * 1024])
+def test_iter_json_formats(text, chunk_size):
+    assert _parse(text, chunk_size) == ITEMS
+
+
+def test_iter_json_empty_array():
+    assert _parse("[]") == []
+    assert _parse("  [ \n ]\n") == []
+
+
+def test_iter_json_rejects_truncated_document():
+    with pytest.raises(json.JSONDecodeError):
+        _parse(json.dumps(ITEMS)[:-5], chunk_size=7)
+
+
+def test_validate_normalizes_aware_created_at_to_naive_utc():
+    for value in ("2024-01-02T03:04:05+03:00", "2024-01-02T00:04:05Z"):
+        created_at = importer._validate({"value": "Zz9!Zz9!Zz9!", "created_at": value})[4]
+        assert created_at == datetime(2024, 1, 2, 0, 4, 5)
+        assert created_at.tzinfo is None
@@ -0,0 +1,15 @@
+import asyncio
+from unittest import mock
+
+import inline
+
+
+def test_inline_answer_escapes_password_html():
+    query = mock.MagicMock(query="16")
+    query.answer = mock.AsyncMock()
+    with mock.patch.object(inline.pool, "take", return_value=["a<b>&c"]):
+        asyncio.run(inline.inline_passwords(query))
+
+    results = query.answer.await_args.args[0]
+    assert results[0].title == "a<b>&c"
+    assert results[0].input_message_content.message_text == "<code>a&lt;b&gt;&amp;c</code>"
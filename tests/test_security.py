@@ -0,0 +1,11 @@
+import pytest
+
+from security import calculate_password_strength, password_strength
+
+
+@pytest.mark.parametrize("password", ["abcdefgh", "Abcdefgh12", "Zz9!Zz9!Zz9!Zz9!", "1234567890123"])
+def test_check_view_score_matches_stored_score(password):
+    report, _ = calculate_password_strength(password)
+    score, entropy = password_strength(password)
+    assert report["score"] == score
+    assert report["entropy"] == entropy
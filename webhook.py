@@ -0,0 +1,103 @@
+import asyncio
+import hmac
+import logging
+from typing import Set
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from pydantic import ValidationError
+
+from config import (
+    WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_HOST, WEBHOOK_PORT,
+    WEBHOOK_MAX_CONCURRENCY, WEBHOOK_SHUTDOWN_TIMEOUT
+)
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookHandler:
+    """Приём обновлений Telegram по вебхуку.
+
+    Ответ 200 отдаётся сразу после проверки секрета и разбора JSON, само
+    обновление обрабатывается фоновой задачей. Одновременно выполняется
+    не больше max_concurrency задач: когда все слоты заняты, новый запрос
+    ждёт освобождения слота, и Telegram сам притормаживает доставку.
+    """
+
+    def __init__(self, dp: Dispatcher, bot: Bot, secret: str, max_concurrency: int):
+        self.dp = dp
+        self.bot = bot
+        self.secret = secret
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), self.secret):
+            return web.Response(status=401)
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self.bot})
+        except (ValueError, ValidationError):
+            return web.Response(status=400)
+
+        await self._slots.acquire()
+        task = asyncio.create_task(self._process(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._done)
+        return web.Response()
+
+    async def _process(self, update: Update) -> None:
+        try:
+            await self.dp.feed_update(self.bot, update)
+        except Exception as e:
+            logger.error(f"Ошибка обработки обновления {update.update_id}: {e}", exc_info=True)
+
+    def _done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        self._slots.release()
+
+    async def drain(self, timeout: float) -> None:
+        """Дожидается обработки принятых обновлений, остальные отменяет"""
+        if not self._tasks:
+            return
+        logger.info(f"⏳ Завершение {len(self._tasks)} обработчиков...")
+        _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning(f"⚠️ Прервано обработчиков: {len(pending)}")
+
+
+def create_app(handler: WebhookHandler, path: str = WEBHOOK_PATH) -> web.Application:
+    app = web.Application()
+    app.router.add_post(path, handler.handle)
+    return app
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher) -> None:
+    """Запуск бота в режиме вебхука до отмены задачи.
+
+    При остановке сервер перестаёт принимать запросы, уже принятые
+    обновления дообрабатываются в течение WEBHOOK_SHUTDOWN_TIMEOUT.
+    Вебхук при остановке не удаляется: обновления, пришедшие во время
+    перезапуска, Telegram доставит повторно.
+    """
+    handler = WebhookHandler(dp, bot, WEBHOOK_SECRET, WEBHOOK_MAX_CONCURRENCY)
+    runner = web.AppRunner(create_app(handler))
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT).start()
+        await bot.set_webhook(
+            url=WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=dp.resolve_used_update_types(),
+            max_connections=min(WEBHOOK_MAX_CONCURRENCY, 100)
+        )
+        logger.info(f"🚀 Bot started in webhook mode on {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+        await handler.drain(WEBHOOK_SHUTDOWN_TIMEOUT)
+        logger.info("🌐 Webhook server stopped")
@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import multiprocessing
+import queue
+import signal
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.client.default import DefaultBotProperties
+from aiogram.enums import ParseMode
+from aiogram.types import Update
+
+from config import (
+    TOKEN, BOT_WORKERS, TG_GLOBAL_RATE, WORKER_CONCURRENCY, WORKER_QUEUE_SIZE,
+    WORKER_RESTART_SECONDS
+)
+from database import create_pool, close_pools
+from hibp_checker import close_hibp_session
+from inline import pool as inline_pool
+from outbound import OutboundScheduler
+
+logger = logging.getLogger(__name__)
+
+# spawn: дочерний процесс не наследует пулы и сессии родителя
+_mp = multiprocessing.get_context("spawn")
+
+_STOP = None
+
+
+def _update_key(data: Dict[str, Any]) -> int:
+    """Ключ распределения: пользователь, иначе чат"""
+    user = data.get("event_from_user")
+    if user is not None:
+        return user.id
+    chat = data.get("event_chat")
+    return chat.id if chat is not None else 0
+
+
+class WorkerPool:
+    """Процессы-обработчики с очередью обновлений у каждого.
+
+    Обновления одного пользователя всегда попадают в один процесс, так что
+    его FSM-состояние (MemoryStorage) и порядок обработки сохраняются.
+    Упавший процесс перезапускается с той же очередью: обновления, ещё
+    не взятые из неё, не теряются.
+    """
+
+    def __init__(self, count: int, dispatcher_factory: Callable[[], Dispatcher]):
+        self.dispatcher_factory = dispatcher_factory
+        self.queues = [_mp.Queue(WORKER_QUEUE_SIZE) for _ in range(count)]
+        self.processes: List[Optional[multiprocessing.Process]] = [None] * count
+
+    def _spawn(self, index: int) -> None:
+        process = _mp.Process(
+            target=run_worker,
+            args=(index, self.queues[index], self.dispatcher_factory),
+            name=f"bot-worker-{index}",
+            daemon=True
+        )
+        process.start()
+        self.processes[index] = process
+
+    def start(self) -> None:
+        for index in range(len(self.queues)):
+            self._spawn(index)
+        logger.info(f"👷 Запущено процессов-обработчиков: {len(self.queues)}")
+
+    async def supervise(self) -> None:
+        """Перезапуск упавших процессов"""
+        while True:
+            await asyncio.sleep(WORKER_RESTART_SECONDS)
+            for index, process in enumerate(self.processes):
+                if process is not None and not process.is_alive():
+                    logger.error(
+                        f"💥 Обработчик {index} завершился с кодом {process.exitcode}, перезапуск"
+                    )
+                    self._spawn(index)
+
+    async def submit(self, key: int, raw: Dict[str, Any]) -> None:
+        target = self.queues[key % len(self.queues)]
+        try:
+            target.put_nowait(raw)
+        except queue.Full:
+            # Очередь переполнена: ждём в потоке, не блокируя цикл событий
+            await asyncio.get_running_loop().run_in_executor(None, target.put, raw)
+
+    async def stop(self, timeout: float) -> None:
+        """Просит процессы дообработать очереди и дожидается их завершения"""
+        loop = asyncio.get_running_loop()
+        for target in self.queues:
+            await loop.run_in_executor(None, target.put, _STOP)
+        for process in self.processes:
+            if process is None:
+                continue
+            await loop.run_in_executor(None, process.join, timeout)
+            if process.is_alive():
+                logger.warning(f"⚠️ Обработчик {process.name} не завершился, terminate")
+                process.terminate()
+        logger.info("👷 Процессы-обработчики остановлены")
+
+
+class UpdateForwarder(BaseMiddleware):
+    """Внешний middleware приёмного процесса: отдаёт обновление в WorkerPool
+    вместо локальной обработки"""
+
+    def __init__(self, pool: WorkerPool):
+        self.pool = pool
+
+    async def __call__(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        await self.pool.submit(
+            _update_key(data),
+            event.model_dump(mode="json", by_alias=True, exclude_none=True, exclude_unset=True)
+        )
+
+
+def run_worker(index: int, updates: Any, dispatcher_factory: Callable[[], Dispatcher]) -> None:
+    """Точка входа процесса-обработчика"""
+    # Ctrl+C получает вся группа процессов; останавливает воркеры родитель
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(
+        level=logging.INFO,
+        format=f"%(asctime)s - worker-{index} - %(name)s - %(levelname)s - %(message)s"
+    )
+    asyncio.run(_worker_main(updates, dispatcher_factory()))
+
+
+async def _worker_main(updates: Any, dp: Dispatcher) -> None:
+    """Цикл обработчика: свой пул БД, своя HTTP-сессия HIBP, свой Bot.
+
+    Обновления выполняются параллельно (до WORKER_CONCURRENCY); порядок
+    обработки для одного пользователя держит UserQueueMiddleware диспетчера.
+    """
+    await create_pool()
+    inline_pool.warm()
+    bot = Bot(token=TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+    # Общий лимит Telegram делится между процессами поровну
+    bot.session.middleware(OutboundScheduler(TG_GLOBAL_RATE / BOT_WORKERS))
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(WORKER_CONCURRENCY)
+    tasks: Set[asyncio.Task] = set()
+
+    async def process(update: Update) -> None:
+        try:
+            await dp.feed_update(bot, update)
+        except Exception as e:
+            logger.error(f"Ошибка обработки обновления {update.update_id}: {e}", exc_info=True)
+
+    def done(task: asyncio.Task) -> None:
+        tasks.discard(task)
+        slots.release()
+
+    try:
+        while True:
+            raw = await loop.run_in_executor(None, updates.get)
+            if raw is _STOP:
+                break
+            update = Update.model_validate(raw, context={"bot": bot})
+            await slots.acquire()
+            task = asyncio.create_task(process(update))
+            tasks.add(task)
+            task.add_done_callback(done)
+        if tasks:
+            await asyncio.wait(set(tasks))
+    finally:
+        await close_hibp_session()
+        await dp.storage.close()
+        await close_pools()
+        await bot.session.close()